@@ -1,27 +1,134 @@
 # -*- coding: utf-8 -*-
 import os
+import re
+import gzip
+import time
+import uuid
+import queue
+import atexit
+import sqlite3
+import json
+import random
+import pstats
+import cProfile
+import hashlib
+import hmac
 import logging
+import mimetypes
+import threading
+import multiprocessing.util
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime
+from io import BytesIO
+from logging.handlers import QueueHandler, QueueListener
 from urllib.parse import urlencode
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import (
+    Flask, Response, render_template, request, redirect, url_for, flash, jsonify,
+    send_from_directory, stream_with_context, g, has_request_context, session,
+)
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-import re
 
-from word_generator import generate_words, ensure_model_trained
-from sqlalchemy import text, func
+try:
+    import brotli
+except ImportError:  # brotli не обязателен: без него отдаём только gzip
+    brotli = None
+
+from metrics import registry as metrics_registry
+from font_index import load_index as load_font_index, normalize_query as normalize_font_query
+from word_model import model_registry
+from word_dictionary import tier_for
+from themes import theme_css, themes_version, DEFAULT_THEME
+from word_generator import (
+    SEEDED_VERSION, generate_words, iter_words, seeded_chunk, ensure_model_trained, model_will_pad, model_version, pool_stats,
+    words_version,
+)
+from sqlalchemy import text, func, event, literal_column
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.exc import IntegrityError
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-change-in-production')
 
-# Логи: одна строка на событие, понятный формат для отслеживания
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(message)s',
-)
+# Логи: одна строка на событие, понятный формат для отслеживания.
+# Запись в stderr идёт в отдельном потоке (QueueListener): запрос только кладёт запись в очередь.
+# TIPTYP_LOG_FORMAT=json — JSON Lines вместо текста (для сборщиков логов).
+LOG_FORMAT = os.environ.get('TIPTYP_LOG_FORMAT', 'text').strip().lower()
+
+
+class _TextLogFormatter(logging.Formatter):
+    """События — как есть; запись о запросе (record.http) — строка в том же формате с задержкой и размером."""
+
+    def format(self, record):
+        http = getattr(record, 'http', None)
+        if http is None:
+            return super().format(record)
+        return '%s | %-6s | %s %s %s | %s | %.1fms %sB user=%s' % (
+            self.formatTime(record, '%Y-%m-%d %H:%M:%S'), http['kind'].upper(), http['method'], http['path'],
+            http['status'], http['ip'], http['duration_ms'], '-' if http['bytes'] is None else http['bytes'],
+            http['user_id'] if http['user_id'] is not None else '-')
+
+
+_EVENT_LINE_RE = re.compile(r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d \| (\w+) *\| (.*)$', re.S)
+
+
+class _JsonLogFormatter(logging.Formatter):
+    """Одна JSON-строка на запись: поля запроса целиком, у событий — logger и текст."""
+
+    def format(self, record):
+        data = {
+            'ts': '%s.%03dZ' % (time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)), record.msecs),
+            'level': record.levelname.lower(),
+        }
+        http = getattr(record, 'http', None)
+        if http is not None:
+            data.update(http)
+        else:
+            data['logger'] = record.name
+            msg = record.getMessage()
+            # Строки событий «время | ВИД | текст»: время уже есть в ts, вид — отдельным полем
+            m = _EVENT_LINE_RE.match(msg)
+            if m:
+                data['kind'] = m.group(1).lower()
+                msg = m.group(2)
+            data['msg'] = msg
+        return json.dumps(data, ensure_ascii=False)
+
+
+def _setup_logging():
+    """Корневой логгер пишет в очередь, поток-слушатель — в stderr. Возвращает запущенный QueueListener."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(_JsonLogFormatter() if LOG_FORMAT == 'json' else _TextLogFormatter('%(message)s'))
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(logging.INFO)
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+
+def restart_log_listener():
+    """
+    После fork (gunicorn --preload) потока-слушателя в дочернем процессе нет — заводим новый.
+    Вызывается из post_fork в gunicorn.conf.py только для воркеров: другие дочерние процессы
+    (пул хеширования паролей) не логируют, и свой поток им не нужен.
+    """
+    global _log_listener
+    thread = _log_listener._thread
+    if thread is not None and thread.is_alive():
+        return
+    _log_listener = _setup_logging()
+
+
+_log_listener = _setup_logging()
+atexit.register(lambda: _log_listener.stop())
 log = logging.getLogger(__name__)
 # Убираем дублирующий вывод запросов от Werkzeug
 logging.getLogger('werkzeug').setLevel(logging.WARNING)
@@ -40,27 +147,333 @@ _data_dir = os.environ.get('TIPTYP_DATA', _basedir)
 _db_path = os.path.join(_data_dir, 'tiptyp.db')
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + _db_path.replace('\\', '/')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+# Профиль SQLite. production — для нескольких воркеров gunicorn на одном файле БД:
+# WAL (читатели не ждут писателя), busy_timeout вместо мгновенного "database is locked",
+# synchronous=NORMAL (в WAL безопасно при сбое процесса), кэш страниц 16 МБ на соединение.
+DB_PROFILE = os.environ.get('TIPTYP_DB_PROFILE', 'default')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('TIPTYP_DB_BUSY_TIMEOUT_MS', '10000'))
+SQLITE_PRAGMAS = {
+    'production': (
+        ('journal_mode', 'WAL'),
+        ('synchronous', 'NORMAL'),
+        ('cache_size', '-16000'),
+        ('temp_store', 'MEMORY'),
+        ('wal_autocheckpoint', '1000'),
+    ),
+}
+if DB_PROFILE == 'production':
+    # Соединений хватает на потоки gunicorn + поток записи результатов
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 4,
+        'max_overflow': 4,
+        'pool_timeout': 30,
+        'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000.0},
+    }
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_on_connect(dbapi_conn, _record):
+    """PRAGMA выбранного профиля на каждое новое соединение с SQLite."""
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    try:
+        cur.execute('PRAGMA busy_timeout = %d' % SQLITE_BUSY_TIMEOUT_MS)
+        for name, value in SQLITE_PRAGMAS.get(DB_PROFILE, ()):
+            cur.execute('PRAGMA %s = %s' % (name, value))
+    finally:
+        cur.close()
+
+
+_db_query_seconds = metrics_registry.histogram(
+    'tiptyp_db_query_seconds', 'Время SQL-запросов по типу оператора', ('statement',))
+_DB_STATEMENTS = {'select', 'insert', 'update', 'delete', 'pragma', 'create', 'alter', 'begin'}
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _db_query_start(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _db_query_end(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('query_started', None)
+    if started is None:
+        return
+    kind = statement.lstrip()[:8].split(None, 1)[0].lower() if statement.strip() else ''
+    _db_query_seconds.observe(kind if kind in _DB_STATEMENTS else 'other', value=time.perf_counter() - started)
+
 # Загрузки: аватарки в data/avatars
 _avatars_dir = os.path.join(_data_dir, 'avatars')
 os.makedirs(_avatars_dir, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = _avatars_dir
 app.config['MAX_AVATAR_SIZE'] = 2 * 1024 * 1024  # 2 MB
 ALLOWED_AVATAR_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+# Аватарки пережимаются в квадратный WebP нескольких размеров: <sha256>_<size>.webp.
+# Имя зависит только от содержимого, поэтому файлы отдаются как immutable.
+AVATAR_SIZES = (256, 128)
+AVATAR_QUALITY = 85
+AVATAR_MAX_AGE = 365 * 24 * 3600
+# Больше пикселей не декодируем: маленький PNG/WebP может развернуться в сотни МБ (draft сжимает только JPEG)
+AVATAR_MAX_PIXELS = 40 * 1000 * 1000
+_AVATAR_NAME_RE = re.compile(r'^([0-9a-f]{20})\.webp$')
+_AVATAR_FILE_RE = re.compile(r'^[0-9a-f]{20}_(\d+)\.webp$')
+_LEGACY_AVATAR_RE = re.compile(r'^user_\d+_\d+\.(png|jpg|jpeg|gif|webp)$')
 
 # Хеширование паролей: только хеш хранится в БД, пароль в открытом виде нигде не сохраняется
-PASSWORD_HASH_METHOD = 'pbkdf2:sha256:600000'
+PASSWORD_HASH_METHOD = os.environ.get('TIPTYP_PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
 PASSWORD_SALT_LENGTH = 16
+# Werkzeug дописывает параметры по умолчанию ('scrypt' -> 'scrypt:32768:8:1'): полный префикс
+# хеша берётся один раз при старте с пустого пароля. Неверный метод — ошибка сразу при старте.
+PASSWORD_HASH_PREFIX = generate_password_hash('', method=PASSWORD_HASH_METHOD, salt_length=1).split('$', 1)[0]
+# Хеширование идёт в отдельных процессах, чтобы не занимать потоки gunicorn.
+# Больше HASH_MAX_PENDING одновременных операций — сразу 503 (0 воркеров — в текущем потоке).
+HASH_WORKERS = int(os.environ.get('TIPTYP_HASH_WORKERS', '2'))
+HASH_MAX_PENDING = int(os.environ.get('TIPTYP_HASH_QUEUE', str(max(1, HASH_WORKERS) * 4)))
+HASH_TIMEOUT = 10
+
+
+class HashPoolBusy(Exception):
+    """Пул хеширования паролей переполнен — запрос отклоняется сразу, а не ждёт."""
+
+
+class PasswordHasher(object):
+    """
+    Ограниченный пул процессов для generate_password_hash / check_password_hash.
+    Время каждой операции (ожидание + вычисление) копится в g.hash_ms для логов запроса.
+    """
+
+    def __init__(self, workers, max_pending, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolBusy()
+        t0 = time.perf_counter()
+        release = True
+        try:
+            if self.workers <= 0:
+                return fn(*args, **kwargs)
+            future = self._executor().submit(fn, *args, **kwargs)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                # Ещё не начатая задача снимается; начатая держит слот, пока не досчитается,
+                # иначе очередь пула росла бы сверх max_pending
+                future.cancel()
+                release = False
+                future.add_done_callback(lambda _f: self._slots.release())
+                raise HashPoolBusy()
+        finally:
+            if release:
+                self._slots.release()
+            if has_request_context():
+                g.hash_ms = g.get('hash_ms', 0.0) + (time.perf_counter() - t0) * 1000
+
+    def shutdown(self):
+        """
+        Остановить пул этого процесса при выходе: без этого выход ждёт воркеров пула
+        в multiprocessing.util._exit_function. Ожидающие задачи отменяются, начатые
+        досчитываются (wait=True: иначе финализаторы очередей пула закрывают канал
+        раньше, чем воркерам уйдёт стоп-сигнал).
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None and self._pid == os.getpid():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, method=PASSWORD_HASH_METHOD, salt_length=PASSWORD_SALT_LENGTH)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+
+password_hasher = PasswordHasher(HASH_WORKERS, HASH_MAX_PENDING, HASH_TIMEOUT)
+atexit.register(password_hasher.shutdown)
+# В дочерних процессах multiprocessing atexit не вызывается: выход идёт через util._exit_function,
+# который ждёт воркеров пула. Финализаторы выполняются раньше этого ожидания, по убыванию
+# exitpriority; приоритет выше, чем у очередей пула (10), чтобы стоп-сигнал успел уйти воркерам.
+multiprocessing.util.Finalize(None, password_hasher.shutdown, exitpriority=100)
+
+
+def _hash_ms():
+    return int(round(g.get('hash_ms', 0.0)))
 
 db = SQLAlchemy(app)
 login_manager = LoginManager(app)
 
 
+@app.before_request
+def _mark_request_start():
+    g.request_started = time.perf_counter()
+
+
+# Профилирование запросов (по умолчанию выключено). TIPTYP_PROFILING=1 включает режим; запрос профилируется,
+# если в нём есть секрет TIPTYP_PROFILE_TOKEN (заголовок X-Tiptyp-Profile или ?_profile=), либо случайно
+# с долей TIPTYP_PROFILE_SAMPLE. Профили (.prof, формат pstats) пишутся в TIPTYP_DATA/profiles.
+PROFILING_ENABLED = os.environ.get('TIPTYP_PROFILING', '0').strip().lower() in ('1', 'true', 'yes', 'on')
+PROFILE_TOKEN = os.environ.get('TIPTYP_PROFILE_TOKEN') or None
+PROFILE_SAMPLE_RATE = float(os.environ.get('TIPTYP_PROFILE_SAMPLE', '0') or 0)
+PROFILE_KEEP = int(os.environ.get('TIPTYP_PROFILE_KEEP', '200'))
+PROFILE_TOP = 15
+_profiles_dir = os.path.join(_data_dir, 'profiles')
+_PROFILE_NAME_RE = re.compile(r'^(\d{8}-\d{6}-\d{3})_(\w+)_([A-Z]+)_(\d+)ms\.prof$')
+# Статику и служебные маршруты случайная выборка не трогает
+_PROFILE_SKIP_ENDPOINTS = {'static', 'asset_file', 'avatar_file', 'theme_stylesheet', 'metrics', 'admin_profiles', 'admin_profile_file'}
+# cProfile нельзя включить в двух потоках сразу (Python 3.12+), поэтому один профиль на процесс за раз
+_profile_lock = threading.Lock()
+
+
+def _token_matches(given, expected):
+    """Сравнение секрета за постоянное время (байты: compare_digest не принимает не-ASCII str)."""
+    return bool(expected) and given is not None and hmac.compare_digest(given.encode('utf-8'), expected.encode('utf-8'))
+
+
+def _profile_token_ok():
+    token = request.headers.get('X-Tiptyp-Profile') or request.args.get('_profile')
+    return _token_matches(token, PROFILE_TOKEN)
+
+
+@app.before_request
+def _start_profile():
+    if not PROFILING_ENABLED or request.endpoint in _PROFILE_SKIP_ENDPOINTS:
+        return
+    if not _profile_token_ok() and not (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE):
+        return
+    if not _profile_lock.acquire(blocking=False):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Уже работает другой профилировщик (отладчик, sys.monitoring) — пропускаем запрос
+        _profile_lock.release()
+        return
+    g.profiler = profiler
+
+
+def _save_profile(profiler, duration_ms):
+    os.makedirs(_profiles_dir, exist_ok=True)
+    now = datetime.now()
+    name = '%s-%03d_%s_%s_%dms.prof' % (now.strftime('%Y%m%d-%H%M%S'), now.microsecond // 1000,
+                                        re.sub(r'\W', '_', request.endpoint or 'unmatched'), request.method, duration_ms)
+    profiler.dump_stats(os.path.join(_profiles_dir, name))
+    saved = sorted(f for f in os.listdir(_profiles_dir) if _PROFILE_NAME_RE.match(f))
+    for old in saved[:max(0, len(saved) - PROFILE_KEEP)]:
+        try:
+            os.remove(os.path.join(_profiles_dir, old))
+        except OSError:
+            pass
+    return name
+
+
+def _finish_profile(response):
+    """
+    Останавливает профилировщик до логирования и метрик: регистрируется последним среди
+    after_request (см. ниже disable_html_cache), а Flask вызывает их в обратном порядке.
+    Для потоковых ответов тело в профиль не попадает.
+    """
+    profiler = g.pop('profiler', None)
+    if profiler is None:
+        return response
+    try:
+        profiler.disable()
+        started = g.get('request_started')
+        duration_ms = (time.perf_counter() - started) * 1000 if started is not None else 0
+        name = _save_profile(profiler, duration_ms)
+        response.headers['X-Tiptyp-Profile-Id'] = name
+        log.info('%s | %-6s | PROFILE saved %s %s -> %s | %s', _log_time(), 'APP', request.method, request.path, name, _client_ip())
+    except Exception:
+        log.exception('%s | %-6s | PROFILE save failed %s', _log_time(), 'APP', request.path)
+    finally:
+        _profile_lock.release()
+    return response
+
+
+@app.teardown_request
+def _abort_profile(_exc):
+    """Запрос упал до after_request — профилировщик всё равно надо остановить и отпустить lock."""
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+
+
+@lru_cache(maxsize=256)
+def _profile_summary(name):
+    """Топ функций профиля по суммарному времени: [(функция, вызовов, своё мс, всего мс)], общее время мс."""
+    stats = pstats.Stats(os.path.join(_profiles_dir, name))
+    stats.sort_stats('cumulative')
+    top = []
+    for func in stats.fcn_list[:PROFILE_TOP]:
+        _cc, calls, tottime, cumtime, _callers = stats.stats[func]
+        top.append((pstats.func_std_string(func), calls, tottime * 1000, cumtime * 1000))
+    return top, stats.total_tt * 1000
+
+
+@app.route('/admin/profiles')
+def admin_profiles():
+    """Список сохранённых профилей с топом функций. Доступ — тем же токеном (?_profile=)."""
+    if not PROFILING_ENABLED or not _profile_token_ok():
+        return '', 404
+    names = sorted((f for f in os.listdir(_profiles_dir) if _PROFILE_NAME_RE.match(f)), reverse=True) \
+        if os.path.isdir(_profiles_dir) else []
+    profiles = []
+    for name in names[:50]:
+        stamp, endpoint, method, ms = _PROFILE_NAME_RE.match(name).groups()
+        try:
+            top, total_ms = _profile_summary(name)
+        except Exception:
+            continue
+        profiles.append({'name': name, 'time': datetime.strptime(stamp, '%Y%m%d-%H%M%S-%f'), 'endpoint': endpoint,
+                         'method': method, 'ms': int(ms), 'total_ms': total_ms, 'top': top})
+    return render_template('profiles.html', profiles=profiles, token=request.args.get('_profile'),
+                           sample_rate=PROFILE_SAMPLE_RATE)
+
+
+@app.route('/admin/profiles/<name>')
+def admin_profile_file(name):
+    """Скачать .prof (открывается в snakeviz / python -m pstats)."""
+    if not PROFILING_ENABLED or not _profile_token_ok() or not _PROFILE_NAME_RE.match(name):
+        return '', 404
+    return send_from_directory(_profiles_dir, name, as_attachment=True)
+
+
+def _request_user_id():
+    """id пользователя, не вызывая загрузку current_user, если запрос его не трогал."""
+    user = g.get('_login_user')
+    if user is not None:
+        return getattr(user, 'id', None)
+    user_id = session.get('_user_id') if session else None
+    return int(user_id) if user_id and str(user_id).isdigit() else None
+
+
 @app.after_request
 def log_request(response):
-    """Один понятный лог на запрос: тип, метод, путь, статус, IP. Статика — только при DEBUG."""
-    ip = _client_ip()
+    """
+    Одна структурированная запись на запрос: тип, метод, путь, маршрут, статус, IP, пользователь,
+    размер ответа и время от before_request. Статика — только при DEBUG.
+    Для потоковых ответов время — до отдачи заголовков, размер неизвестен.
+    """
+    started = g.get('request_started')
+    duration_ms = (time.perf_counter() - started) * 1000 if started is not None else 0.0
     path = request.path or '/'
-    if path.startswith('/static/'):
+    if path.startswith(('/static/', '/assets/', '/avatar/', '/theme/')):
         kind = 'static'
     elif path.startswith('/api/'):
         kind = 'api'
@@ -68,11 +481,55 @@ def log_request(response):
         kind = 'xhr'
     else:
         kind = 'page'
-    msg = '%s | %-6s | %s %s %s | %s' % (_log_time(), kind.upper(), request.method, path, response.status_code, ip)
-    if kind == 'static':
-        log.debug(msg)
-    else:
-        log.info(msg)
+    level = logging.DEBUG if kind == 'static' else logging.INFO
+    if log.isEnabledFor(level):
+        log.log(level, 'request', extra={'http': {
+            'kind': kind,
+            'method': request.method,
+            'path': path,
+            'route': request.url_rule.rule if request.url_rule is not None else None,
+            'status': response.status_code,
+            'ip': _client_ip(),
+            'user_id': _request_user_id(),
+            'bytes': response.content_length if response.content_length is not None or response.is_streamed
+            else response.calculate_content_length(),
+            'duration_ms': round(duration_ms, 2),
+        }})
+    return response
+
+
+_http_requests = metrics_registry.counter(
+    'tiptyp_http_requests_total', 'Запросы по endpoint, методу и статусу', ('endpoint', 'method', 'status'))
+_http_request_seconds = metrics_registry.histogram(
+    'tiptyp_http_request_seconds', 'Время обработки запроса до отдачи заголовков; для /api/words — по генератору и объёму',
+    ('endpoint', 'generator', 'count'))
+# Значения generator в /api/words
+WORD_GENERATORS = ('words', 'model', 'syllable', 'practice')
+
+
+def _words_count_range(count):
+    """Объём /api/words корзиной, чтобы не плодить метки на каждое значение count."""
+    if count <= 100:
+        return '1-100'
+    if count <= 1000:
+        return '101-1000'
+    return '1001-10000'
+
+
+@app.after_request
+def _observe_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    endpoint = request.endpoint or 'unmatched'
+    generator = count = ''
+    if endpoint == 'api_words':
+        generator = request.args.get('generator', 'words')
+        if generator not in WORD_GENERATORS:
+            generator = 'words'
+        count = _words_count_range(request.args.get('count', 45, type=int) or 45)
+    _http_requests.inc(endpoint, request.method, str(response.status_code))
+    _http_request_seconds.observe(endpoint, generator, count, value=time.perf_counter() - started)
     return response
 
 
@@ -80,6 +537,57 @@ login_manager.login_view = 'login'
 login_manager.login_message = 'Войдите, чтобы видеть эту страницу.'
 
 
+class UserCache(object):
+    """
+    LRU-кэш с TTL для current_user: id -> отсоединённый снимок пользователя.
+    Избавляет каждый авторизованный запрос от SELECT по user. После изменения
+    пользователя нужно вызвать invalidate(id); другие процессы увидят изменение через ttl.
+    """
+
+    def __init__(self, maxsize=1024, ttl=30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, load):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and item[0] > now:
+                self._items.move_to_end(user_id)
+                self.hits += 1
+                return item[1]
+            generation = self._generation
+            self.misses += 1
+        value = load(user_id)
+        if value is not None and self.ttl > 0:
+            with self._lock:
+                # Если пока грузили, кого-то инвалидировали — не кладём возможно устаревший снимок
+                if generation == self._generation:
+                    self._items[user_id] = (now + self.ttl, value)
+                    self._items.move_to_end(user_id)
+                    while len(self._items) > self.maxsize:
+                        self._items.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+
+user_cache = UserCache(ttl=float(os.environ.get('TIPTYP_USER_CACHE_TTL', '30')))
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -96,15 +604,15 @@ class User(UserMixin, db.Model):
 
     def set_password(self, password):
         """Сохраняет только хеш пароля. Пароль в открытом виде в БД не попадает."""
-        self.password_hash = generate_password_hash(
-            password,
-            method=PASSWORD_HASH_METHOD,
-            salt_length=PASSWORD_SALT_LENGTH,
-        )
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
         """Проверка пароля по сохранённому хешу."""
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """Хеш сделан другим методом/числом итераций, чем PASSWORD_HASH_METHOD."""
+        return (self.password_hash or '').split('$', 1)[0] != PASSWORD_HASH_PREFIX
 
 
 class TypingResult(db.Model):
@@ -116,37 +624,325 @@ class TypingResult(db.Model):
     chars_typed = db.Column(db.Integer, nullable=False)
     chars_correct = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    client_key = db.Column(db.String(64), nullable=True)  # ключ идемпотентности от клиента
+
+    __table_args__ = (
+        # История пользователя: filter_by(user_id).order_by(created_at.desc())
+        db.Index('ix_typing_result_user_created', 'user_id', 'created_at'),
+    )
+
+
+# Повторная отправка того же результата не создаёт дубликат. Ключ уникален в пределах
+# владельца (гости, user_id IS NULL, — как владелец 0): чужой ключ не совпадёт с нашим.
+_RESULT_OWNER = func.coalesce(TypingResult.user_id, literal_column('0'))
+db.Index('ux_typing_result_user_client_key', _RESULT_OWNER, TypingResult.client_key, unique=True)
+
+
+class UserStats(db.Model):
+    """Итоги пользователя за всё время; обновляются в той же транзакции, что и save_result."""
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    total_tests = db.Column(db.Integer, nullable=False, default=0)
+    best_wpm = db.Column(db.Float, nullable=False, default=0)
+    wpm_sum = db.Column(db.Float, nullable=False, default=0)          # для среднего WPM
+    best_accuracy = db.Column(db.Float, nullable=False, default=0)
+    accuracy_sum = db.Column(db.Float, nullable=False, default=0)     # для средней точности
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Таблица лидеров: order_by(best_wpm.desc()).limit(N)
+        db.Index('ix_user_stats_best_wpm', 'best_wpm'),
+    )
+
+
+class UserLetterStats(db.Model):
+    """Ошибки пользователя по буквам за всё время — для режима practice; пополняется в save_result."""
+    __tablename__ = 'user_letter_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    letter = db.Column(db.String(1), primary_key=True)
+    errors = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+# Вход и регистрация ищут логин без учёта регистра: func.lower(User.username) == ...
+db.Index('ix_user_username_lower', func.lower(User.username))
+
+
+def _record_user_stats(user_id, wpm, accuracy):
+    """Атомарный upsert итогов: одна строка на пользователя, без чтения перед записью. Коммитит вызывающий."""
+    stmt = sqlite_insert(UserStats).values(
+        user_id=user_id, total_tests=1,
+        best_wpm=wpm, wpm_sum=wpm,
+        best_accuracy=accuracy, accuracy_sum=accuracy,
+        updated_at=datetime.utcnow(),
+    )
+    new = stmt.excluded
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_={
+            'total_tests': UserStats.total_tests + 1,
+            'best_wpm': func.max(UserStats.best_wpm, new.best_wpm),
+            'wpm_sum': UserStats.wpm_sum + new.wpm_sum,
+            'best_accuracy': func.max(UserStats.best_accuracy, new.best_accuracy),
+            'accuracy_sum': UserStats.accuracy_sum + new.accuracy_sum,
+            'updated_at': new.updated_at,
+        },
+    ))
+
+
+def _record_letter_errors(user_id, letter_errors):
+    """Upsert ошибок по буквам одним executemany: errors += n для каждой буквы. Коммитит вызывающий."""
+    stmt = sqlite_insert(UserLetterStats)
+    now = datetime.utcnow()
+    db.session.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserLetterStats.user_id, UserLetterStats.letter],
+            set_={'errors': UserLetterStats.errors + stmt.excluded.errors, 'updated_at': stmt.excluded.updated_at},
+        ),
+        [{'user_id': user_id, 'letter': letter, 'errors': n, 'updated_at': now}
+         for letter, n in letter_errors.items()],
+    )
+
+
+# Сколько самых слабых букв пользователя учитывает режим practice
+WEAK_LETTERS_MAX = 8
+
+
+def _weak_letters(user_id):
+    """{буква: ошибок} для WEAK_LETTERS_MAX букв с наибольшим числом ошибок (строки по первичному ключу)."""
+    rows = db.session.execute(
+        db.select(UserLetterStats.letter, UserLetterStats.errors)
+        .filter_by(user_id=user_id)
+        .order_by(UserLetterStats.errors.desc())
+        .limit(WEAK_LETTERS_MAX)
+    )
+    return {letter: errors for letter, errors in rows}
+
+
+def _letter_stats_version(user_id):
+    """Версия статистики букв пользователя для ETag: меняется после каждого сохранённого результата с ошибками."""
+    total, updated = db.session.execute(
+        db.select(func.sum(UserLetterStats.errors), func.max(UserLetterStats.updated_at))
+        .filter_by(user_id=user_id)
+    ).one()
+    return '%s@%s' % (total or 0, updated.isoformat() if updated else '-')
+
+
+_BACKFILL_USER_STATS_SQL = text(
+    'INSERT INTO user_stats (user_id, total_tests, best_wpm, wpm_sum, best_accuracy, accuracy_sum, updated_at) '
+    'SELECT user_id, COUNT(id), MAX(wpm), SUM(wpm), MAX(accuracy), SUM(accuracy), CURRENT_TIMESTAMP '
+    'FROM typing_result WHERE user_id IS NOT NULL GROUP BY user_id'
+)
+
+
+def _backfill_user_stats(conn):
+    """Пересчитать user_stats по всем TypingResult одним INSERT ... SELECT. Возвращает число пользователей."""
+    conn.execute(text('DELETE FROM user_stats'))
+    conn.execute(_BACKFILL_USER_STATS_SQL)
+    return conn.execute(text('SELECT COUNT(*) FROM user_stats')).scalar()
+
+
+@app.cli.command('backfill-user-stats')
+def backfill_user_stats_command():
+    """Пересчитать таблицу user_stats по истории результатов: flask --app app backfill-user-stats"""
+    with db.engine.begin() as conn:
+        n = _backfill_user_stats(conn)
+    log.info('%s | %-6s | user_stats rebuilt for %s users', _log_time(), 'APP', n)
+
+
+class UserSnapshot(UserMixin):
+    """Копия полей User без привязки к сессии БД — то, что видят шаблоны и API как current_user."""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.display_name = user.display_name
+        self.avatar = user.avatar
+        self.created_at = user.created_at
+
+    display = User.display
+
+
+def _load_user_snapshot(user_id):
+    user = db.session.get(User, user_id)
+    return UserSnapshot(user) if user is not None else None
 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    return user_cache.get(int(user_id), _load_user_snapshot)
 
 
 # Метка сборки: при обновлении кода на хосте меняется — по ней видно, что отдаётся новая версия
 BUILD_ID = os.environ.get('TIPTYP_BUILD_ID', 'dev')
 
 
-def _static_version():
-    """Версия статики по времени изменения app.js — браузер не кэширует старые файлы после обновления."""
-    try:
-        path = os.path.join(app.root_path, 'static', 'app.js')
-        return str(int(os.path.getmtime(path))) if os.path.isfile(path) else '0'
-    except Exception:
-        return '0'
+# Сжимаем заранее только текстовые форматы; картинки и шрифты уже сжаты
+_COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.map'}
+ASSET_MAX_AGE = 365 * 24 * 3600
+_ASSET_NAME_RE = re.compile(r'^(.+)\.([0-9a-f]{12})(\.[^./]+)$')
+
+
+class AssetManifest(object):
+    """
+    Манифест статики: для каждого файла из static/ — хеш содержимого, имя с хешем
+    (style.<hash>.css) и заранее сжатые gzip/brotli-варианты в памяти. Строится при старте;
+    с auto_reload (режим отладки) файл пересобирается, когда меняется его mtime.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._by_name = {}
+        self._by_hashed = {}
+        self._lock = threading.Lock()
+        self.build()
+
+    def _entry(self, name):
+        path = os.path.join(self.folder, name)
+        st = os.stat(path)
+        with open(path, 'rb') as fh:
+            data = fh.read()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        entry = {
+            'name': name,
+            'hashed': '%s.%s%s' % (stem, digest, ext),
+            'digest': digest,
+            'stamp': (st.st_mtime_ns, st.st_size),
+            'mimetype': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+            'identity': data,
+        }
+        if ext.lower() in _COMPRESSIBLE_EXTENSIONS:
+            gz = gzip.compress(data, 9, mtime=0)
+            if len(gz) < len(data):
+                entry['gzip'] = gz
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                if len(br) < len(data):
+                    entry['br'] = br
+        return entry
+
+    def _add(self, entry):
+        old = self._by_name.get(entry['name'])
+        if old is not None:
+            self._by_hashed.pop(old['hashed'], None)
+        self._by_name[entry['name']] = entry
+        self._by_hashed[entry['hashed']] = entry
+
+    def build(self):
+        t0 = time.perf_counter()
+        by_name, by_hashed = {}, {}
+        for root, _dirs, files in os.walk(self.folder):
+            for f in files:
+                name = os.path.relpath(os.path.join(root, f), self.folder).replace(os.sep, '/')
+                entry = self._entry(name)
+                by_name[name] = entry
+                by_hashed[entry['hashed']] = entry
+        with self._lock:
+            self._by_name, self._by_hashed = by_name, by_hashed
+        sizes = [sum(len(e.get(k, b'')) for e in by_name.values()) for k in ('identity', 'gzip', 'br')]
+        log.info('%s | %-6s | ASSETS built files=%s raw=%sKB gzip=%sKB br=%s in %.0fms', _log_time(), 'APP',
+                 len(by_name), sizes[0] // 1024, sizes[1] // 1024, '%sKB' % (sizes[2] // 1024) if brotli else 'off',
+                 (time.perf_counter() - t0) * 1000)
+
+    def get(self, name, auto_reload=False):
+        """Запись по исходному имени (или None, если такого файла нет в static/)."""
+        entry = self._by_name.get(name)
+        if auto_reload:
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            if entry is None or entry['stamp'] != (st.st_mtime_ns, st.st_size):
+                entry = self._entry(name)
+                with self._lock:
+                    self._add(entry)
+        return entry
+
+    def get_hashed(self, hashed):
+        return self._by_hashed.get(hashed)
+
+
+asset_manifest = AssetManifest(os.path.join(app.root_path, 'static'))
+
+
+@app.template_global()
+def asset_url(filename, **values):
+    """
+    Как url_for('static', filename=...), но с хешем содержимого в имени файла:
+    такой URL можно кэшировать навсегда. Файлы вне манифеста отдаются обычной /static/.
+    """
+    entry = asset_manifest.get(filename, auto_reload=app.debug)
+    if entry is None:
+        return url_for('static', filename=filename, **values)
+    return url_for('asset_file', filename=entry['hashed'], **values)
+
+
+@app.route('/assets/<path:filename>')
+def asset_file(filename):
+    """Статика по имени с хешем: brotli/gzip-вариант по Accept-Encoding, immutable-кэш на год."""
+    entry = asset_manifest.get_hashed(filename)
+    immutable = entry is not None
+    if entry is None:
+        # Страница со старым хешем (после деплоя): отдаём текущую версию, но без долгого кэша
+        m = _ASSET_NAME_RE.match(filename)
+        entry = asset_manifest.get(m.group(1) + m.group(3)) if m else None
+        if entry is None:
+            return '', 404
+    encoding = 'identity'
+    for candidate in ('br', 'gzip'):
+        if candidate in entry and request.accept_encodings[candidate]:
+            encoding = candidate
+            break
+    response = Response(entry[encoding], mimetype=entry['mimetype'])
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.set_etag('%s-%s' % (entry['digest'], encoding))
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.template_global()
+def theme_css_url(theme_id):
+    """URL CSS одной темы; версия в пути меняется вместе с содержимым themes.py."""
+    return url_for('theme_stylesheet', version=themes_version(), theme_id=theme_id)
+
+
+@app.route('/theme/<version>/<theme_id>.css')
+def theme_stylesheet(version, theme_id):
+    """CSS одной темы: считается один раз на процесс, кэшируется браузером навсегда."""
+    css = theme_css(theme_id)
+    if css is None:
+        return '', 404
+    response = Response(css, mimetype='text/css')
+    response.set_etag('%s-%s' % (themes_version(), theme_id))
+    if version == themes_version():
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.context_processor
 def inject_lang():
     lang = request.args.get('lang', 'ru') if request else 'ru'
     if not request:
-        return {'lang': lang, 'url_lang_ru': '/?lang=ru', 'url_lang_en': '/?lang=en', 'static_version': _static_version(), 'build_id': BUILD_ID}
+        return {'lang': lang, 'url_lang_ru': '/?lang=ru', 'url_lang_en': '/?lang=en', 'build_id': BUILD_ID, 'default_theme': DEFAULT_THEME}
     args = request.args.to_dict(flat=True)
     args_ru = {**args, 'lang': 'ru'}
     args_en = {**args, 'lang': 'en'}
     url_lang_ru = request.path + '?' + urlencode(args_ru)
     url_lang_en = request.path + '?' + urlencode(args_en)
-    return {'lang': lang, 'url_lang_ru': url_lang_ru, 'url_lang_en': url_lang_en, 'static_version': _static_version(), 'build_id': BUILD_ID}
+    return {'lang': lang, 'url_lang_ru': url_lang_ru, 'url_lang_en': url_lang_en, 'build_id': BUILD_ID, 'default_theme': DEFAULT_THEME}
 
 
 @app.after_request
@@ -158,11 +954,31 @@ def disable_html_cache(response):
     return response
 
 
+# Последний зарегистрированный after_request выполняется первым: профиль не включает логирование и метрики
+app.after_request(_finish_profile)
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 
+@app.errorhandler(HashPoolBusy)
+def hash_pool_busy(_e):
+    """Вход/регистрация при переполненном пуле хеширования: быстрый 503 с Retry-After."""
+    lang = request.args.get('lang', 'ru')
+    log.info('%s | %-6s | %s rejected, hash pool busy | %s', _log_time(), 'AUTH', request.endpoint, _client_ip())
+    db.session.rollback()
+    if request.path.startswith('/api/'):
+        response = jsonify({'ok': False, 'error': 'Сервер занят, попробуйте ещё раз'})
+    else:
+        flash('Server is busy, please try again in a moment.' if lang == 'en' else 'Сервер занят, попробуйте ещё раз через секунду.', 'error')
+        response = app.make_response(render_template('register.html' if request.endpoint == 'register' else 'login.html'))
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
 def _normalize_username_for_check(name):
     """Нормализация логина для проверки уникальности (без учёта регистра)."""
     return (name or '').strip().lower()
@@ -179,12 +995,18 @@ def login():
         canonical = _normalize_username_for_check(username_raw)
         user = User.query.filter(func.lower(User.username) == canonical).first() if canonical else None
         if user and user.check_password(password):
+            if user.password_needs_rehash():
+                # Пароль известен только сейчас — переводим хеш на текущую стоимость
+                user.set_password(password)
+                db.session.commit()
+                user_cache.invalidate(user.id)
+                log.info('%s | %-6s | REHASH user=%s method=%s', _log_time(), 'AUTH', user.username, PASSWORD_HASH_METHOD)
             login_user(user)
-            log.info('%s | %-6s | LOGIN ok user=%s | %s', _log_time(), 'AUTH', user.username, _client_ip())
+            log.info('%s | %-6s | LOGIN ok user=%s hash_ms=%s | %s', _log_time(), 'AUTH', user.username, _hash_ms(), _client_ip())
             flash('You are logged in.' if lang == 'en' else 'Вы вошли в систему.', 'success')
             next_page = request.args.get('next') or url_for('index')
             return _redirect_with_lang(next_page)
-        log.info('%s | %-6s | LOGIN fail user=%s | %s', _log_time(), 'AUTH', username_raw or '(empty)', _client_ip())
+        log.info('%s | %-6s | LOGIN fail user=%s hash_ms=%s | %s', _log_time(), 'AUTH', username_raw or '(empty)', _hash_ms(), _client_ip())
         flash('Invalid username or password.' if lang == 'en' else 'Неверный логин или пароль.', 'error')
     return render_template('login.html')
 
@@ -231,7 +1053,7 @@ def register():
             flash('This username is already taken.' if lang == 'en' else 'Такой логин уже занят.', 'error')
             return render_template('register.html')
         login_user(user)
-        log.info('%s | %-6s | REGISTER ok user=%s | %s', _log_time(), 'AUTH', user.username, _client_ip())
+        log.info('%s | %-6s | REGISTER ok user=%s hash_ms=%s | %s', _log_time(), 'AUTH', user.username, _hash_ms(), _client_ip())
         flash('Registration successful.' if lang == 'en' else 'Регистрация прошла успешно.', 'success')
         return _redirect_with_lang(url_for('index'))
     return render_template('register.html')
@@ -264,54 +1086,111 @@ def _allowed_avatar(filename):
     return ext in ALLOWED_AVATAR_EXTENSIONS
 
 
+def _avatar_files(name):
+    """Файлы на диске, относящиеся к значению User.avatar (все размеры или старый одиночный файл)."""
+    m = _AVATAR_NAME_RE.match(name or '')
+    if m:
+        return ['%s_%d.webp' % (m.group(1), size) for size in AVATAR_SIZES]
+    if _LEGACY_AVATAR_RE.match(name or ''):
+        return [name]
+    return []
+
+
+def _process_avatar(data):
+    """
+    Декодирует загруженную картинку, обрезает по центру в квадрат и сохраняет WebP
+    размеров AVATAR_SIZES. Возвращает значение для User.avatar. ValueError — не картинка.
+    """
+    from PIL import Image, ImageOps
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    name = digest + '.webp'
+    folder = app.config['UPLOAD_FOLDER']
+    if all(os.path.isfile(os.path.join(folder, f)) for f in _avatar_files(name)):
+        return name
+    try:
+        img = Image.open(BytesIO(data))
+        img.draft('RGB', (AVATAR_SIZES[0], AVATAR_SIZES[0]))
+    except Exception as e:
+        raise ValueError('not an image: %s' % e)
+    if img.width * img.height > AVATAR_MAX_PIXELS:
+        raise ValueError('image too large: %dx%d' % img.size)
+    try:
+        img = ImageOps.exif_transpose(img)
+    except Exception as e:
+        raise ValueError('not an image: %s' % e)
+    img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    for size in AVATAR_SIZES:
+        side = min(size, img.width, img.height)
+        thumb = ImageOps.fit(img, (side, side), Image.LANCZOS)
+        path = os.path.join(folder, '%s_%d.webp' % (digest, size))
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        thumb.save(tmp, 'WEBP', quality=AVATAR_QUALITY, method=4)
+        os.replace(tmp, path)
+    return name
+
+
+def _remove_avatar(name, user_id):
+    """Удаляет файлы старой аватарки, если она больше ни у кого не стоит (одинаковые загрузки делят файлы)."""
+    if not name or User.query.filter(User.avatar == name, User.id != user_id).first() is not None:
+        return
+    for f in _avatar_files(name):
+        path = os.path.join(app.config['UPLOAD_FOLDER'], f)
+        if os.path.isfile(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+@app.template_global()
+def avatar_url(name, size=AVATAR_SIZES[-1]):
+    """URL аватарки нужного размера (берётся ближайший не меньший); старые файлы — как есть."""
+    m = _AVATAR_NAME_RE.match(name or '')
+    if not m:
+        return url_for('avatar_file', filename=name)
+    fit = min((s for s in AVATAR_SIZES if s >= size), default=AVATAR_SIZES[0])
+    return url_for('avatar_file', filename='%s_%d.webp' % (m.group(1), fit))
+
+
 @app.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
     lang = request.args.get('lang', 'ru')
     if request.method == 'POST':
+        # current_user — снимок из кэша; изменения пишем в строку из БД
+        user = db.session.get(User, current_user.id)
+        replaced_avatar = None
         # Обновление никнейма
         new_name = request.form.get('display_name', '').strip()
         if len(new_name) > 80:
             flash('Display name is too long.' if lang == 'en' else 'Никнейм слишком длинный.', 'error')
         else:
-            current_user.display_name = new_name if new_name else None
+            user.display_name = new_name if new_name else None
         # Загрузка аватарки
         if 'avatar' in request.files:
             f = request.files['avatar']
             if f and f.filename and _allowed_avatar(f.filename):
-                if f.content_length and f.content_length > app.config['MAX_AVATAR_SIZE']:
+                data = f.read(app.config['MAX_AVATAR_SIZE'] + 1)
+                if len(data) > app.config['MAX_AVATAR_SIZE']:
                     flash('File is too large.' if lang == 'en' else 'Файл слишком большой.', 'error')
                 else:
-                    ext = f.filename.rsplit('.', 1)[-1].lower()
-                    safe_name = 'user_%s_%s.%s' % (current_user.id, int(datetime.utcnow().timestamp()), ext)
-                    path = os.path.join(app.config['UPLOAD_FOLDER'], safe_name)
                     try:
-                        f.save(path)
-                        if os.path.getsize(path) > app.config['MAX_AVATAR_SIZE']:
-                            os.remove(path)
-                            flash('File is too large.' if lang == 'en' else 'Файл слишком большой.', 'error')
-                        else:
-                            if current_user.avatar:
-                                old_path = os.path.join(app.config['UPLOAD_FOLDER'], current_user.avatar)
-                                if os.path.isfile(old_path):
-                                    try:
-                                        os.remove(old_path)
-                                    except OSError:
-                                        pass
-                            current_user.avatar = safe_name
-                            flash('Avatar updated.' if lang == 'en' else 'Аватар обновлён.', 'success')
-                    except Exception:
-                        if os.path.isfile(path):
-                            try:
-                                os.remove(path)
-                            except OSError:
-                                pass
+                        name = _process_avatar(data)
+                        if name != user.avatar:
+                            replaced_avatar = user.avatar
+                            user.avatar = name
+                        flash('Avatar updated.' if lang == 'en' else 'Аватар обновлён.', 'success')
+                    except Exception as e:
+                        log.warning('%s | %-6s | AVATAR failed user=%s: %s | %s', _log_time(), 'USER', user.username, e, _client_ip())
                         flash('Failed to save avatar.' if lang == 'en' else 'Не удалось сохранить аватар.', 'error')
             elif f and f.filename:
                 flash('Allowed formats: PNG, JPG, GIF, WebP.' if lang == 'en' else 'Разрешены форматы: PNG, JPG, GIF, WebP.', 'error')
         db.session.commit()
-        if current_user.is_authenticated:
-            log.info('%s | %-6s | PROFILE saved user=%s | %s', _log_time(), 'USER', current_user.username, _client_ip())
+        user_cache.invalidate(user.id)
+        # Старые файлы удаляются только после коммита: при ошибке пользователь остаётся с рабочей аватаркой
+        _remove_avatar(replaced_avatar, user.id)
+        log.info('%s | %-6s | PROFILE saved user=%s | %s', _log_time(), 'USER', user.username, _client_ip())
         return redirect(url_for('profile', lang=lang))
     return render_template('profile.html')
 
@@ -319,11 +1198,200 @@ def profile():
 @app.route('/avatar/<path:filename>')
 def avatar_file(filename):
     """Раздача аватарок только из нашей папки и только безопасное имя."""
-    if not filename or not re.match(r'^user_\d+_\d+\.(png|jpg|jpeg|gif|webp)$', filename):
+    if _AVATAR_FILE_RE.match(filename or ''):
+        # Имя = хеш содержимого: файл по этому URL никогда не меняется. ETag передаётся в send_file,
+        # чтобы make_conditional сравнивал If-None-Match именно с ним (и отвечал 304)
+        response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=AVATAR_MAX_AGE,
+                                       etag=filename.rsplit('.', 1)[0])
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    if not filename or not _LEGACY_AVATAR_RE.match(filename):
         return '', 404
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 
+@app.cli.command('migrate-avatars')
+def migrate_avatars_command():
+    """Пережать старые аватарки user_<id>_<ts>.<ext> в WebP с хешем в имени: flask --app app migrate-avatars"""
+    done = failed = 0
+    for user in User.query.filter(User.avatar.isnot(None)).all():
+        if not _LEGACY_AVATAR_RE.match(user.avatar):
+            continue
+        old = user.avatar
+        path = os.path.join(app.config['UPLOAD_FOLDER'], old)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            user.avatar = _process_avatar(data)
+        except Exception as e:
+            failed += 1
+            print('  %s: %s — пропущено (%s)' % (user.username, old, e))
+            continue
+        db.session.commit()
+        user_cache.invalidate(user.id)
+        _remove_avatar(old, user.id)
+        done += 1
+        print('  %s: %s (%d КБ) -> %s' % (user.username, old, len(data) // 1024, user.avatar))
+    print('Перенесено аватарок: %d, с ошибками: %d' % (done, failed))
+
+
+_CLIENT_KEY_RE = re.compile(r'^[\w-]{8,64}$')
+# Гистограмма ошибок по буквам в save_result: не больше букв и ошибок на букву
+LETTER_ERRORS_MAX_LETTERS = 64
+LETTER_ERRORS_MAX_COUNT = 10000
+
+
+def _parse_letter_errors(value):
+    """
+    {"ы": 3, "Щ": 1} -> {'ы': 3, 'щ': 1}: одиночные буквы (в нижнем регистре, повторы
+    складываются) и целые 0–LETTER_ERRORS_MAX_COUNT. Нули отбрасываются. None — формат неверный.
+    """
+    if value is None:
+        return {}
+    if not isinstance(value, dict) or len(value) > LETTER_ERRORS_MAX_LETTERS:
+        return None
+    result = {}
+    for letter, n in value.items():
+        if not (isinstance(letter, str) and len(letter) == 1 and letter.isalpha()):
+            return None
+        if isinstance(n, bool) or not isinstance(n, int) or not 0 <= n <= LETTER_ERRORS_MAX_COUNT:
+            return None
+        if n:
+            letter = letter.lower()
+            result[letter] = result.get(letter, 0) + n
+    return result
+
+
+def _store_result(fields):
+    """
+    Вставляет результат и обновляет user_stats и ошибки по буквам (fields['letter_errors'])
+    в текущей транзакции (коммитит вызывающий). Результат с client_key, уже известным
+    для этого пользователя, пропускается. Возвращает id или None для дубликата.
+    """
+    values = {k: v for k, v in fields.items() if k != 'letter_errors'}
+    res = db.session.execute(
+        sqlite_insert(TypingResult).values(**values)
+        .on_conflict_do_nothing(index_elements=[_RESULT_OWNER, TypingResult.client_key])
+    )
+    if not res.rowcount:
+        return None
+    if fields.get('user_id') is not None:
+        _record_user_stats(fields['user_id'], fields['wpm'], fields['accuracy'])
+        if fields.get('letter_errors'):
+            _record_letter_errors(fields['user_id'], fields['letter_errors'])
+    return res.inserted_primary_key[0]
+
+
+_result_write_seconds = metrics_registry.histogram(
+    'tiptyp_result_write_seconds', 'Запись результатов: вставка + commit (sync — в запросе, batch — пачкой)', ('mode',))
+_results_written = metrics_registry.counter(
+    'tiptyp_results_written_total', 'Записано результатов', ('mode',))
+
+
+class ResultWriter(object):
+    """
+    Групповая запись результатов: save_result кладёт строки в очередь, один поток
+    пишет их пачками — одна транзакция (и один fsync SQLite) на flush_size строк
+    или на flush_interval секунд. При остановке процесса очередь дописывается (atexit).
+    """
+
+    def __init__(self, flush_size=100, flush_interval=0.2):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.written = 0
+
+    def submit(self, fields):
+        self._ensure_worker()
+        self._queue.put(fields)
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='result-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.flush_size and batch[-1] is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            stop = batch[-1] is None
+            rows = [row for row in batch if row is not None]
+            if rows:
+                self._flush(rows)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def _flush(self, rows):
+        with app.app_context():
+            try:
+                t0 = time.perf_counter()
+                for fields in rows:
+                    _store_result(fields)
+                db.session.commit()
+                _result_write_seconds.observe('batch', value=time.perf_counter() - t0)
+                _results_written.inc('batch', amount=len(rows))
+            except Exception:
+                db.session.rollback()
+                log.exception('%s | %-6s | RESULT batch of %s failed, writing one by one', _log_time(), 'DB', len(rows))
+                self._flush_each(rows)
+                return
+        self.batches += 1
+        self.written += len(rows)
+        log.debug('%s | %-6s | RESULT batch flushed rows=%s', _log_time(), 'DB', len(rows))
+
+    def _flush_each(self, rows):
+        """Запасной путь: каждая строка в своей транзакции, чтобы одна плохая не теряла пачку."""
+        for fields in rows:
+            try:
+                _store_result(fields)
+                db.session.commit()
+                self.written += 1
+            except Exception:
+                db.session.rollback()
+                log.exception('%s | %-6s | RESULT dropped key=%s', _log_time(), 'DB', fields.get('client_key'))
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def drain(self):
+        """Дождаться записи всего, что уже в очереди."""
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        """Дописать очередь и остановить поток (вызывается при выходе процесса)."""
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=30)
+
+
+# Буферизованная запись результатов: TIPTYP_WRITE_BATCH=1
+app.config['RESULT_WRITE_BATCH'] = os.environ.get('TIPTYP_WRITE_BATCH', '0') == '1'
+result_writer = ResultWriter()
+atexit.register(result_writer.close)
+
+
 @app.route('/api/save_result', methods=['POST'])
 def save_result():
     data = request.get_json() or {}
@@ -332,46 +1400,294 @@ def save_result():
     time_seconds = data.get('time_seconds')
     chars_typed = data.get('chars_typed')
     chars_correct = data.get('chars_correct')
+    client_key = data.get('client_key') or None
     if wpm is None or accuracy is None or time_seconds is None:
         return jsonify({'ok': False, 'error': 'Не хватает данных'}), 400
-    r = TypingResult(
-        user_id=current_user.id if current_user.is_authenticated else None,
+    if client_key is not None and not (isinstance(client_key, str) and _CLIENT_KEY_RE.match(client_key)):
+        return jsonify({'ok': False, 'error': 'Некорректный client_key'}), 400
+    letter_errors = _parse_letter_errors(data.get('letter_errors'))
+    if letter_errors is None:
+        return jsonify({'ok': False, 'error': 'Некорректный letter_errors'}), 400
+    user_id = current_user.id if current_user.is_authenticated else None
+    fields = dict(
+        user_id=user_id,
         wpm=float(wpm),
         accuracy=float(accuracy),
         time_seconds=int(time_seconds),
         chars_typed=int(chars_typed or 0),
         chars_correct=int(chars_correct or 0),
+        created_at=datetime.utcnow(),
     )
-    db.session.add(r)
+    if letter_errors and user_id is not None:
+        fields['letter_errors'] = letter_errors
+    if app.config['RESULT_WRITE_BATCH']:
+        # id появится только после записи пачки — клиенту возвращается ключ
+        fields['client_key'] = client_key or uuid.uuid4().hex
+        result_writer.submit(fields)
+        log.info('%s | %-6s | RESULT queued key=%s user_id=%s wpm=%s acc=%s%% | %s',
+                 _log_time(), 'USER', fields['client_key'], user_id, fields['wpm'], round(fields['accuracy'], 1), _client_ip())
+        return jsonify({'ok': True, 'id': None, 'key': fields['client_key'], 'queued': True})
+    fields['client_key'] = client_key
+    t0 = time.perf_counter()
+    rid = _store_result(fields)
     db.session.commit()
-    user_id = current_user.id if current_user.is_authenticated else None
+    _result_write_seconds.observe('sync', value=time.perf_counter() - t0)
+    _results_written.inc('sync')
+    if rid is None:
+        rid = db.session.query(TypingResult.id).filter_by(user_id=user_id, client_key=client_key).scalar()
     log.info('%s | %-6s | RESULT saved id=%s user_id=%s wpm=%s acc=%s%% | %s',
-             _log_time(), 'USER', r.id, user_id, r.wpm, round(r.accuracy, 1), _client_ip())
-    return jsonify({'ok': True, 'id': r.id})
+             _log_time(), 'USER', rid, user_id, fields['wpm'], round(fields['accuracy'], 1), _client_ip())
+    return jsonify({'ok': True, 'id': rid, 'key': client_key})
+
+
+# Постраничная выдача и потоковый режим /api/words
+WORDS_PAGE_MAX = 1000
+WORDS_STREAM_CHUNK = 500
+# Ответы с seed детерминированы — их можно долго кэшировать (браузер, обратный прокси)
+SEEDED_WORDS_MAX_AGE = 30 * 24 * 3600
+_SEED_RE = re.compile(r'^[\w-]{1,64}$')
+
+
+def _ndjson_words(count, generator, lang, seed=None, top=None, letters=None):
+    """NDJSON: первая строка — параметры, далее {"words": [...]} порциями по WORDS_STREAM_CHUNK."""
+    meta = {'generator': generator, 'lang': lang, 'total': count}
+    if generator == 'model':
+        meta['padded'] = model_will_pad(count, lang)
+    if top:
+        meta['top'] = top
+    if letters:
+        meta['letters'] = _letters_param(letters)
+    yield app.json.dumps(meta) + '\n'
+    try:
+        for chunk in iter_words(count, generator, lang, chunk_size=WORDS_STREAM_CHUNK, seed=seed, top=top,
+                                letters=letters):
+            yield app.json.dumps({'words': chunk}) + '\n'
+    except Exception as e:
+        yield app.json.dumps({'error': str(e)}) + '\n'
+
+
+def _seeded_words(count, generator, lang, seed, offset, size, top=None, letters=None):
+    """
+    Слова [offset, offset + size) воспроизводимой последовательности — та же, что в потоковом
+    режиме. Генерируются только порции, в которые попадает страница: O(size), а не O(offset).
+    """
+    first = offset // WORDS_STREAM_CHUNK
+    last = (offset + size - 1) // WORDS_STREAM_CHUNK
+    words = []
+    for index in range(first, last + 1):
+        words.extend(seeded_chunk(seed, index, count, generator, lang, WORDS_STREAM_CHUNK, top, letters))
+    start = offset - first * WORDS_STREAM_CHUNK
+    return words[start:start + size]
+
+
+def _seeded_etag(*parts):
+    """ETag считается по параметрам запроса, сборке, версии алгоритмов и модели — без генерации слов."""
+    key = '|'.join(str(p) for p in (BUILD_ID, SEEDED_VERSION) + parts)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def _cache_seeded(response, etag, private=False):
+    """
+    private — выдача зависит от сессии (practice у вошедшего пользователя): только кэш
+    браузера, Vary: Cookie и no-cache — статистика меняется после каждого результата, поэтому
+    браузер каждый раз переспрашивает по ETag. immutable только у публичной выдачи по seed.
+    """
+    response.set_etag(etag)
+    if private:
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.vary.add('Cookie')
+    else:
+        response.headers['Cache-Control'] = 'public, max-age=%d, immutable' % SEEDED_WORDS_MAX_AGE
+    return response
+
+
+def _parse_letters_param(value):
+    """?letters=ы:5,щ:3,ж -> {'ы': 5, 'щ': 3, 'ж': 1}; некорректные элементы пропускаются."""
+    letters = {}
+    for item in (value or '').split(',')[:LETTER_ERRORS_MAX_LETTERS]:
+        letter, _, n = item.strip().partition(':')
+        if len(letter) != 1 or not letter.isalpha():
+            continue
+        n = int(n) if n.isascii() and n.isdigit() else 1
+        if 0 < n <= LETTER_ERRORS_MAX_COUNT:
+            letters[letter.lower()] = n
+    return letters
+
+
+def _letters_param(letters):
+    """{буква: ошибок} -> строка в формате ?letters=, самые слабые буквы первыми."""
+    return ','.join('%s:%d' % kv for kv in sorted(letters.items(), key=lambda kv: (-kv[1], kv[0])))
 
 
 @app.route('/api/words')
 def api_words():
-    """Генерация слов для теста. ?count=45&generator=words|model|syllable&lang=ru|en, count 1–10000"""
+    """
+    Генерация слов для теста. ?count=45&generator=words|model|syllable|practice&lang=ru|en, count 1–10000.
+    &offset=0&limit=200 — одна страница из count слов (в ответе total и next_offset). Без seed
+    сервер сам выбирает seed для первой страницы и возвращает его: следующие страницы
+    запрашиваются с ним (offset > 0 без seed — 400), чтобы продолжать ту же последовательность;
+    &stream=1 — весь count потоком NDJSON;
+    &seed=abc — воспроизводимая выдача с ETag и долгим Cache-Control;
+    &top=1000 — для words и practice: только из 1000 самых частых слов частотного словаря
+    (округляется вверх до уровня из TIERS, в ответе — действующий top);
+    &letters=ы:5,щ:3 — для practice без входа: слабые буквы и число ошибок. У вошедшего
+    пользователя слабые буквы берутся из его статистики (user_letter_stats).
+    """
     count = request.args.get('count', 45, type=int)
     count = max(1, min(10000, count))
     generator = request.args.get('generator', 'words')
     lang = request.args.get('lang', 'ru')
-    if generator not in ('words', 'model', 'syllable'):
+    if generator not in WORD_GENERATORS:
         generator = 'words'
     if lang not in ('ru', 'en'):
         lang = 'ru'
+    top = request.args.get('top', type=int) if generator in ('words', 'practice') else None
+    # Выдача идёт из готового уровня словаря: top приводится к нему, в ответ и ETag попадает он же
+    top = tier_for(top) if top is not None and top > 0 else None
+    letters = None
+    # Выдача practice у вошедшего пользователя зависит от его строк в БД, даже если их пока нет
+    personal = generator == 'practice' and current_user.is_authenticated
+    if generator == 'practice':
+        if personal:
+            letters = _weak_letters(current_user.id)
+        if not letters:
+            letters = _parse_letters_param(request.args.get('letters'))
+    seed = request.args.get('seed') or None
+    if seed is not None and not _SEED_RE.match(seed):
+        return jsonify({'error': 'Некорректный seed', 'words': []}), 400
+    stream = request.args.get('stream') in ('1', 'true', 'ndjson')
+    paged = not stream and ('offset' in request.args or 'limit' in request.args)
+    offset = 0
+    size = count
+    if paged:
+        offset = max(0, min(count, request.args.get('offset', 0, type=int)))
+        limit = max(1, min(WORDS_PAGE_MAX, request.args.get('limit', WORDS_PAGE_MAX, type=int)))
+        size = min(limit, count - offset)
+    server_seed = False
+    if paged and seed is None:
+        if offset > 0:
+            return jsonify({'error': 'Для offset > 0 нужен seed из ответа на первую страницу', 'words': []}), 400
+        seed = uuid.uuid4().hex[:16]
+        server_seed = True
+    etag = None
+    if seed is not None and not server_seed:
+        if generator == 'model':
+            version = model_version(lang)
+        elif generator in ('words', 'practice'):
+            version = words_version(lang)
+        else:
+            version = None
+        etag = _seeded_etag(seed, generator, lang, count, stream, paged, offset, size, top, version,
+                            _letters_param(letters or {}),
+                            _letter_stats_version(current_user.id) if personal else None)
+        if request.if_none_match.contains(etag):
+            return _cache_seeded(Response(status=304), etag, personal)
+    if stream:
+        response = Response(stream_with_context(_ndjson_words(count, generator, lang, seed, top, letters)),
+                            mimetype='application/x-ndjson')
+        return _cache_seeded(response, etag, personal) if etag else response
     try:
-        words = generate_words(count=count, generator=generator, lang=lang)
-        return jsonify({'words': words, 'generator': generator, 'lang': lang})
+        if size <= 0:
+            words = []
+        elif seed is not None:
+            words = _seeded_words(count, generator, lang, seed, offset, size, top, letters)
+        else:
+            words = generate_words(count=size, generator=generator, lang=lang, top=top, letters=letters)
+        payload = {'words': words, 'generator': generator, 'lang': lang}
+        if generator == 'model':
+            payload['padded'] = model_will_pad(count, lang)
+        if top:
+            payload['top'] = top
+        if letters:
+            payload['letters'] = _letters_param(letters)
+        if paged:
+            end = offset + len(words)
+            payload.update({'total': count, 'offset': offset, 'next_offset': end if end < count else None})
+        if seed is not None:
+            payload['seed'] = seed
+        if etag:
+            return _cache_seeded(jsonify(payload), etag, personal)
+        return jsonify(payload)
     except Exception as e:
         return jsonify({'error': str(e), 'words': []}), 503
 
 
+FONTS_SEARCH_MAX = 200
+FONTS_MAX_AGE = 300
+_font_index = None
+_font_index_lock = threading.Lock()
+
+
+def _get_font_index():
+    """Индекс шрифтов строится (или читается из instance/) один раз на процесс при первом запросе."""
+    global _font_index
+    if _font_index is None:
+        with _font_index_lock:
+            if _font_index is None:
+                t0 = time.perf_counter()
+                _font_index = load_font_index()
+                log.info('%s | %-6s | FONTS index ready fonts=%s in %.0fms', _log_time(), 'APP',
+                         len(_font_index.names), (time.perf_counter() - t0) * 1000)
+    return _font_index
+
+
+@app.route('/api/fonts')
+def api_fonts():
+    """Поиск шрифта по подстроке без учёта регистра: ?q=mono&limit=20 -> {fonts, total}. Пустой q — по алфавиту."""
+    q = normalize_font_query((request.args.get('q') or '')[:100])
+    limit = max(1, min(FONTS_SEARCH_MAX, request.args.get('limit', 20, type=int)))
+    index = _get_font_index()
+    digest = hashlib.sha1(('%s\0%d' % (q, limit)).encode('utf-8')).hexdigest()[:12]
+    etag = '%s-%s' % (index.version, digest)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        fonts, total = index.search(q, limit)
+        response = jsonify({'fonts': fonts, 'total': total})
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = FONTS_MAX_AGE
+    return response
+
+
+METRICS_ENABLED = os.environ.get('TIPTYP_METRICS', '1').strip().lower() not in ('0', 'false', 'no', 'off')
+METRICS_TOKEN = os.environ.get('TIPTYP_METRICS_TOKEN') or None
+
+
+@metrics_registry.add_collector
+def _app_stats_metrics():
+    """Уже существующие счётчики процесса: кэш пользователей, пулы слов, реестр моделей, запись результатов."""
+    pools = pool_stats()
+    models = model_registry.stats()
+    return [
+        ('tiptyp_user_cache_requests_total', 'counter', 'Обращения к кэшу пользователей сессии',
+         {(('result', 'hit'),): user_cache.hits, (('result', 'miss'),): user_cache.misses}),
+        ('tiptyp_word_pool_requests_total', 'counter', 'Выдачи из пулов слов (miss — пул пуст, генерация в запросе)',
+         dict(item for key, st in pools.items()
+              for item in (((('pool', key), ('result', 'hit')), st['hits']), ((('pool', key), ('result', 'miss')), st['misses'])))),
+        ('tiptyp_word_pool_size', 'gauge', 'Слов в пуле сейчас', {(('pool', key),): st['size'] for key, st in pools.items()}),
+        ('tiptyp_model_registry_total', 'counter', 'Реестр моделей: загрузки, попадания, перечитывания',
+         {(('event', name),): value for name, value in models.items()}),
+        ('tiptyp_result_writer_queue', 'gauge', 'Результатов в очереди групповой записи',
+         {(): result_writer.pending()}),
+    ]
+
+
+@app.route('/metrics')
+def metrics():
+    """Метрики этого процесса в текстовом формате Prometheus. TIPTYP_METRICS_TOKEN — требовать Bearer-токен."""
+    if not METRICS_ENABLED:
+        return '', 404
+    if METRICS_TOKEN and not _token_matches(request.headers.get('Authorization'), 'Bearer ' + METRICS_TOKEN):
+        return '', 401
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/my_stats')
 def my_stats():
     if not current_user.is_authenticated:
-        return jsonify({'results': [], 'best_wpm': None, 'avg_wpm': None, 'total_tests': 0})
+        return jsonify({'results': [], 'best_wpm': None, 'avg_wpm': None, 'best_accuracy': None, 'total_tests': 0,
+                        'weak_letters': ''})
     results = TypingResult.query.filter_by(user_id=current_user.id).order_by(TypingResult.created_at.desc()).limit(50).all()
     arr = [{
         'id': r.id,
@@ -380,33 +1696,155 @@ def my_stats():
         'time_seconds': r.time_seconds,
         'created_at': r.created_at.isoformat() if r.created_at else None,
     } for r in results]
-    wpm_list = [r.wpm for r in results]
+    # Лучший/средний — за всё время, из user_stats (одна строка по первичному ключу)
+    agg = db.session.get(UserStats, current_user.id)
+    total = agg.total_tests if agg else 0
     return jsonify({
         'results': arr,
-        'best_wpm': max(wpm_list) if wpm_list else None,
-        'avg_wpm': round(sum(wpm_list) / len(wpm_list), 1) if wpm_list else None,
-        'total_tests': TypingResult.query.filter_by(user_id=current_user.id).count(),
+        'best_wpm': agg.best_wpm if total else None,
+        'avg_wpm': round(agg.wpm_sum / total, 1) if total else None,
+        'best_accuracy': agg.best_accuracy if total else None,
+        'total_tests': total,
+        'weak_letters': _letters_param(_weak_letters(current_user.id)),
     })
 
 
-def _ensure_profile_columns():
-    """Добавить колонки профиля в существующую таблицу user, если их ещё нет."""
+# ——— Миграции схемы ———
+# Номер последней применённой миграции хранится в schema_version; при старте
+# применяются только новые, каждая в своей транзакции. Миграции идемпотентны,
+# чтобы одновременный старт нескольких воркеров ничего не ломал.
+
+def _table_columns(conn, table):
+    return {row[1] for row in conn.execute(text('PRAGMA table_info("%s")' % table))}
+
+
+def _migration_profile_columns(conn):
+    """Колонки профиля в таблице user, созданной до их появления."""
+    columns = _table_columns(conn, 'user')
+    if 'display_name' not in columns:
+        conn.execute(text('ALTER TABLE user ADD COLUMN display_name VARCHAR(80)'))
+    if 'avatar' not in columns:
+        conn.execute(text('ALTER TABLE user ADD COLUMN avatar VARCHAR(120)'))
+
+
+def _create_indexes(conn, *names):
+    """CREATE INDEX IF NOT EXISTS для индексов моделей с указанными именами."""
+    for table in (TypingResult.__table__, UserStats.__table__, User.__table__):
+        for index in table.indexes:
+            if index.name in names:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def _migration_indexes(conn):
+    """Индексы для истории, таблицы лидеров и поиска логина (для БД, созданных до них)."""
+    _create_indexes(conn, 'ix_typing_result_user_created', 'ix_user_stats_best_wpm', 'ix_user_username_lower')
+
+
+def _migration_client_key(conn):
+    """Ключ идемпотентности результата (для буферизованной записи и повторных отправок)."""
+    if 'client_key' not in _table_columns(conn, 'typing_result'):
+        conn.execute(text('ALTER TABLE typing_result ADD COLUMN client_key VARCHAR(64)'))
+
+
+def _migration_client_key_per_user(conn):
+    """Уникальность client_key в пределах пользователя вместо глобальной."""
+    conn.execute(text('DROP INDEX IF EXISTS ux_typing_result_client_key'))
+    _create_indexes(conn, 'ux_typing_result_user_client_key')
+
+
+def _migration_user_stats(conn):
+    """Заполнить user_stats по уже сохранённым результатам."""
+    _backfill_user_stats(conn)
+
+
+MIGRATIONS = [
+    (1, 'profile columns', _migration_profile_columns),
+    (2, 'indexes', _migration_indexes),
+    (3, 'user_stats backfill', _migration_user_stats),
+    (4, 'typing_result client_key', _migration_client_key),
+    (5, 'typing_result client_key per user', _migration_client_key_per_user),
+]
+
+
+def _schema_version(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_version '
+        '(version INTEGER PRIMARY KEY, name VARCHAR(80), applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)'
+    ))
+    return conn.execute(text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def _run_migrations():
+    """Применить миграции новее текущей версии схемы. Возвращает список применённых номеров."""
+    with db.engine.begin() as conn:
+        current = _schema_version(conn)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        with db.engine.begin() as conn:
+            # Блокировка на запись до проверки: воркеры, стартующие одновременно, идут по очереди
+            conn.exec_driver_sql('BEGIN IMMEDIATE')
+            if conn.execute(text('SELECT 1 FROM schema_version WHERE version = :v'), {'v': version}).first():
+                continue  # применил другой воркер
+            migrate(conn)
+            conn.execute(text('INSERT OR IGNORE INTO schema_version (version, name) VALUES (:v, :n)'),
+                         {'v': version, 'n': name})
+        applied.append(version)
+        log.info('%s | %-6s | migration %s applied: %s', _log_time(), 'APP', version, name)
+    return applied
+
+
+# Запросы горячих путей и индексы, которые они обязаны использовать
+def _query_plan_checks():
+    recent = TypingResult.query.filter_by(user_id=1).order_by(TypingResult.created_at.desc()).limit(50)
+    leaders = UserStats.query.order_by(UserStats.best_wpm.desc()).limit(10)
+    by_login = User.query.filter(func.lower(User.username) == 'user')
+    weak = UserLetterStats.query.filter_by(user_id=1).order_by(UserLetterStats.errors.desc()).limit(WEAK_LETTERS_MAX)
+    return [
+        ('my_stats recent results', recent, 'ix_typing_result_user_created'),
+        ('leaderboard', leaders, 'ix_user_stats_best_wpm'),
+        ('login lookup', by_login, 'ix_user_username_lower'),
+        ('practice weak letters', weak, 'sqlite_autoindex_user_letter_stats_1'),
+    ]
+
+
+def _explain(query):
+    sql = str(query.statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}))
     with db.engine.connect() as conn:
-        try:
-            conn.execute(text('ALTER TABLE user ADD COLUMN display_name VARCHAR(80)'))
-            conn.commit()
-        except Exception:
-            conn.rollback()
-        try:
-            conn.execute(text('ALTER TABLE user ADD COLUMN avatar VARCHAR(120)'))
-            conn.commit()
-        except Exception:
-            conn.rollback()
+        return ' / '.join(row[-1] for row in conn.execute(text('EXPLAIN QUERY PLAN ' + sql)))
+
+
+def check_query_plans():
+    """[(имя, план, индекс используется)] по EXPLAIN QUERY PLAN для запросов из _query_plan_checks."""
+    result = []
+    for name, query, index in _query_plan_checks():
+        plan = _explain(query)
+        result.append((name, plan, index in plan))
+    return result
+
+
+@app.cli.command('check-indexes')
+def check_indexes_command():
+    """Проверить, что горячие запросы идут по индексам: flask --app app check-indexes"""
+    failed = False
+    for name, plan, ok in check_query_plans():
+        print('%-4s %-26s %s' % ('ok' if ok else 'FAIL', name, plan))
+        failed = failed or not ok
+    if failed:
+        raise SystemExit(1)
+
+
+def _init_schema():
+    """Создать таблицы и применить миграции; безопасно при одновременном старте нескольких воркеров."""
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+        db.metadata.create_all(conn)
+    _run_migrations()
 
 
 with app.app_context():
-    db.create_all()
-    _ensure_profile_columns()
+    _init_schema()
     ensure_model_trained()
 
 
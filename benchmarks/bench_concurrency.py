@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка многопроцессной работы с одним файлом SQLite (как gunicorn --workers N).
+Каждый процесс импортирует приложение сам (как воркер без --preload), регистрирует
+пользователя и в несколько потоков гоняет /api/save_result и /api/my_stats.
+Завершается с кодом 1, если был хоть один ответ 5xx ("database is locked" и т.п.).
+Запуск: python benchmarks/bench_concurrency.py [processes] [threads] [iterations]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _worker(proc_no, threads, iterations, out):
+    sys.path.insert(0, ROOT)
+    import logging
+    logging.disable(logging.INFO)
+    from app import app, password_hasher
+
+    errors = []
+    ok = [0]
+    lock = threading.Lock()
+
+    def hammer(thread_no):
+        client = app.test_client()
+        username = 'bench_%d_%d' % (proc_no, thread_no)
+        client.post('/register', data={'username': username, 'password': 'bench-pass'})
+        for i in range(iterations):
+            for resp in (
+                client.post('/api/save_result', json={'wpm': 30 + i % 70, 'accuracy': 97, 'time_seconds': 20}),
+                client.get('/api/my_stats'),
+            ):
+                with lock:
+                    if resp.status_code >= 500:
+                        errors.append('%s %s' % (resp.status_code, resp.get_data(as_text=True)[:200]))
+                    else:
+                        ok[0] += 1
+
+    workers = [threading.Thread(target=hammer, args=(k,)) for k in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    # Пул хеширования паролей — дочерние процессы этого воркера; без остановки выход ждёт их
+    password_hasher.shutdown()
+    out.put((proc_no, ok[0], errors))
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    os.environ['TIPTYP_DATA'] = tempfile.mkdtemp(prefix='tiptyp-conc-')
+    os.environ.setdefault('TIPTYP_DB_PROFILE', 'production')
+    os.environ.setdefault('TIPTYP_WORD_POOLS', '0')
+    print('БД: {}, профиль {}, процессов {} x потоков {} x {} итераций'.format(
+        os.path.join(os.environ['TIPTYP_DATA'], 'tiptyp.db'), os.environ['TIPTYP_DB_PROFILE'],
+        processes, threads, iterations))
+
+    ctx = multiprocessing.get_context('spawn')
+    out = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(n, threads, iterations, out)) for n in range(processes)]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    results = [out.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = time.perf_counter() - t0
+
+    total_ok = sum(r[1] for r in results)
+    errors = [e for r in results for e in r[2]]
+    print('  запросов без ошибок: {}, ошибок: {}, {:.1f} с ({:.0f} запросов/сек)'.format(
+        total_ok, len(errors), elapsed, total_ok / elapsed))
+    for e in errors[:10]:
+        print('  ' + e)
+    if errors or any(p.exitcode for p in procs):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Задержка поиска шрифтов по полному fonts-list.json: индекс (font_index) против перебора списка,
+как раньше делал браузер. Запросы — все префиксы из 1–3 букв и имена шрифтов целиком.
+Запуск: python benchmarks/bench_font_search.py [limit]
+"""
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from font_index import FONTS_LIST_PATH, FontIndex, normalize_query  # noqa: E402
+
+
+def _linear_search(names, query, limit):
+    """Прежний путь (profile.js): фильтр всего списка по подстроке, первые limit."""
+    q = normalize_query(query)
+    found = [n for n in names if q in n.lower()] if q else names
+    return found[:limit], len(found)
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda p: samples[min(len(samples) - 1, int(len(samples) * p))]  # noqa: E731
+    return pick(0.5) * 1e6, pick(0.99) * 1e6
+
+
+def _measure(fn, queries, limit):
+    samples = []
+    for q in queries:
+        t0 = time.perf_counter()
+        fn(q, limit)
+        samples.append(time.perf_counter() - t0)
+    return _percentiles(samples)
+
+
+def main():
+    limit = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    with open(FONTS_LIST_PATH, encoding='utf-8') as f:
+        names = json.load(f)
+    t0 = time.perf_counter()
+    index = FontIndex.build(names, 'bench')
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    prefixes = sorted({n.lower()[:k] for n in names for k in (1, 2, 3)})
+    queries = prefixes + [n.lower() for n in names]
+    for q in queries[:200]:
+        assert set(index.search(q, 10 ** 6)[0]) == set(_linear_search(names, q, 10 ** 6)[0]), q
+
+    print('шрифтов {}, n-грамм {}, сборка индекса {:.1f} мс, запросов {}'.format(
+        len(names), len(index.postings), build_ms, len(queries)))
+    for label, fn in (('перебор', lambda q, n: _linear_search(names, q, n)), ('индекс', index.search)):
+        p50, p99 = _measure(fn, queries, limit)
+        print('  {:<8} p50 {:>7.1f} мкс, p99 {:>7.1f} мкс'.format(label, p50, p99))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарки генераторов слов и обучения модели: count 1–10000, ru и en.
+train измеряется на корпусе из count слов (словарь повторяется по кругу).
+dictionary — выбор из синтетического частотного словаря на DICTIONARY_SIZE слов (закон Ципфа).
+practice — слова со слабыми буквами PRACTICE_LETTERS по обратному индексу встроенного списка.
+syllable — со своим rng (пачками через rng.choices), syllable_default — без rng (NumPy, если
+установлен; движок записывается в метрику gen.numpy), syllable_loop — прежний цикл по словам.
+Модель обучается и сохраняется во временном каталоге, файлы в instance/ не трогаются.
+Запуск: python benchmarks/bench_generators.py [--quick]; для JSON и сравнения с базой — benchmarks/run.py.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+if not os.environ.get('TIPTYP_BENCH'):
+    os.environ['TIPTYP_BENCH'] = '1'
+    os.environ['TIPTYP_DATA'] = tempfile.mkdtemp(prefix='tiptyp-bench-')
+os.environ.setdefault('TIPTYP_WORD_POOLS', '0')
+
+import word_generator  # noqa: E402
+from word_generator import (  # noqa: E402
+    REAL_WORDS, REAL_WORDS_EN, SYLLABLES, SYLLABLES_EN, generate_practice_words, generate_real_words,
+    generate_syllable_words, generate_via_model,
+)
+from word_dictionary import WordDictionary, build_dictionary_file  # noqa: E402
+from word_model import train  # noqa: E402
+
+COUNTS = (1, 10, 25, 100, 1000, 10000)
+LANGS = ('ru', 'en')
+DICTIONARY_SIZE = 200000
+PRACTICE_LETTERS = {'ru': {'щ': 5, 'ы': 3, 'ж': 2}, 'en': {'k': 5, 'v': 3, 'w': 2}}
+
+
+def time_call(fn, budget=0.3, repeat=5):
+    """Секунд на вызов: лучший из repeat замеров, в каждом столько вызовов, чтобы уложиться в budget."""
+    t0 = time.perf_counter()
+    fn()
+    once = time.perf_counter() - t0
+    number = max(1, int(budget / repeat / max(once, 1e-7)))
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = (time.perf_counter() - t0) / number
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def _corpus(lang, count):
+    words = REAL_WORDS_EN if lang == 'en' else REAL_WORDS
+    return (words * (count // len(words) + 1))[:count]
+
+
+def _syllable_loop(count, lang, rng):
+    """Прежняя реализация generate_syllable_words: randint и choices на каждое слово."""
+    syll = SYLLABLES_EN if lang == 'en' else SYLLABLES
+    return [''.join(rng.choices(syll, k=rng.randint(2, 4))) for _ in range(count)]
+
+
+def _synthetic_dictionary(lang):
+    """Словарь из DICTIONARY_SIZE случайных слов с весом 1/ранг — в отдельном файле, не в instance/."""
+    rnd = random.Random(lang)
+    letters = 'abcdefghijklmnopqrstuvwxyz' if lang == 'en' else 'абвгдежзийклмнопрстуфхцчшщыэюя'
+    words = set()
+    while len(words) < DICTIONARY_SIZE:
+        words.add(''.join(rnd.choice(letters) for _ in range(rnd.randint(2, 10))))
+    items = [(w, 1.0 / rank) for rank, w in enumerate(sorted(words), 1)]
+    path = os.path.join(tempfile.mkdtemp(prefix='tiptyp-bench-dict-'), 'words_%s.dict' % lang)
+    build_dictionary_file(items, path, lang)
+    return WordDictionary(path)
+
+
+def collect(quick=False):
+    """{'имя': {'value', 'unit', 'better'}} — секунды на вызов для каждой пары (функция, язык, count)."""
+    budget = 0.05 if quick else 0.3
+    rng = random.Random(1)
+    dictionaries = {lang: _synthetic_dictionary(lang) for lang in LANGS}
+    cases = {
+        'real_words': lambda n, lang: (lambda: generate_real_words(n, lang, rng)),
+        'syllable': lambda n, lang: (lambda: generate_syllable_words(n, lang=lang, rng=rng)),
+        'syllable_default': lambda n, lang: (lambda: generate_syllable_words(n, lang=lang)),
+        'syllable_loop': lambda n, lang: (lambda: _syllable_loop(n, lang, rng)),
+        'via_model': lambda n, lang: (lambda: generate_via_model(n, lang=lang, rng=rng)),
+        'train': lambda n, lang: (lambda corpus=_corpus(lang, n): train(corpus)),
+        'dictionary': lambda n, lang: (lambda d=dictionaries[lang]: d.sample(n, rng)),
+        'practice': lambda n, lang: (lambda: generate_practice_words(n, lang, PRACTICE_LETTERS[lang], rng)),
+    }
+    for lang in LANGS:
+        generate_via_model(1, lang=lang)  # обучение/загрузка модели не входит в замер
+    results = {'gen.numpy': {'value': int(word_generator.numpy is not None), 'unit': 'bool', 'better': 'info'}}
+    for name, make in cases.items():
+        for lang in LANGS:
+            for n in COUNTS:
+                seconds = time_call(make(n, lang), budget=budget)
+                results['gen.%s.%s.n%d' % (name, lang, n)] = {'value': seconds, 'unit': 's', 'better': 'lower'}
+    return results
+
+
+def main():
+    results = collect(quick='--quick' in sys.argv[1:])
+    for key, r in results.items():
+        if r['unit'] != 's':
+            print('  {:<32} {}'.format(key, r['value']))
+            continue
+        n = int(key.rsplit('.n', 1)[1])
+        print('  {:<32} {:>10.1f} мкс/вызов {:>12.0f} слов/сек'.format(key, r['value'] * 1e6, n / r['value']))
+
+
+if __name__ == '__main__':
+    main()
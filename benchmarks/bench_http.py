@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузка на горячие HTTP-пути через Flask test client (без сети): /api/words для каждого генератора,
+/api/save_result и /api/my_stats. БД во временном каталоге заранее наполняется до реалистичного
+размера: users пользователей и results результатов (у пользователя бенчмарка — самая длинная история).
+Запуск: python benchmarks/bench_http.py [--quick]; для JSON и сравнения с базой — benchmarks/run.py.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+if not os.environ.get('TIPTYP_BENCH'):
+    os.environ['TIPTYP_BENCH'] = '1'
+    os.environ['TIPTYP_DATA'] = tempfile.mkdtemp(prefix='tiptyp-bench-')
+os.environ.setdefault('TIPTYP_WORD_POOLS', '0')
+
+import logging  # noqa: E402
+
+from sqlalchemy import text  # noqa: E402
+
+from app import app, db, _backfill_user_stats  # noqa: E402
+
+logging.getLogger('app').setLevel(logging.WARNING)
+
+BENCH_USER = 'bench_http'
+BENCH_PASSWORD = 'bench-pass'
+
+
+def seed_database(users, results, own_results):
+    """Быстрая вставка пачками в одной транзакции; хеш пароля общий (вход под ними не нужен)."""
+    rnd = random.Random(7)
+    start = datetime.utcnow() - timedelta(days=365)
+    with app.app_context(), db.engine.begin() as conn:
+        if conn.execute(text('SELECT COUNT(*) FROM typing_result')).scalar() >= results:
+            return
+        conn.execute(text('INSERT INTO user (username, password_hash, created_at) VALUES (:u, :h, :c)'),
+                     [{'u': 'seed_%d' % i, 'h': 'pbkdf2:sha256:1$seed$0', 'c': start} for i in range(users)])
+        ids = [r[0] for r in conn.execute(text("SELECT id FROM user WHERE username LIKE 'seed_%'"))]
+        rows = []
+        for i in range(results):
+            rows.append({
+                'user_id': rnd.choice(ids) if rnd.random() < 0.9 else None,
+                'wpm': round(rnd.uniform(15, 120), 1), 'accuracy': round(rnd.uniform(80, 100), 1),
+                'time_seconds': rnd.choice((15, 30, 60)), 'chars_typed': rnd.randint(80, 600),
+                'chars_correct': rnd.randint(70, 580), 'created_at': start + timedelta(seconds=i * 600),
+            })
+        conn.execute(text(
+            'INSERT INTO typing_result (user_id, wpm, accuracy, time_seconds, chars_typed, chars_correct, created_at) '
+            'VALUES (:user_id, :wpm, :accuracy, :time_seconds, :chars_typed, :chars_correct, :created_at)'), rows)
+        _backfill_user_stats(conn)
+    client = app.test_client()
+    client.post('/register', data={'username': BENCH_USER, 'password': BENCH_PASSWORD})
+    for i in range(own_results):
+        client.post('/api/save_result', json={'wpm': 40 + i % 60, 'accuracy': 96, 'time_seconds': 30})
+
+
+def _drive(client, n, request):
+    """n последовательных запросов после одного прогревочного: (p50 мс, p95 мс, запросов/сек)."""
+    request(client, -1).get_data()
+    samples = []
+    t_all = time.perf_counter()
+    for i in range(n):
+        t0 = time.perf_counter()
+        resp = request(client, i)
+        resp.get_data()
+        samples.append(time.perf_counter() - t0)
+        assert resp.status_code == 200, (resp.status_code, resp.get_data(as_text=True)[:200])
+    elapsed = time.perf_counter() - t_all
+    samples.sort()
+    return samples[len(samples) // 2] * 1000, samples[int(len(samples) * 0.95)] * 1000, n / elapsed
+
+
+def collect(quick=False):
+    """{'имя': {'value', 'unit', 'better'}}: p50/p95 в мс и запросов/сек для каждого сценария."""
+    users, results, own = (200, 20000, 200) if quick else (1000, 100000, 1000)
+    n = 100 if quick else 400
+    t0 = time.perf_counter()
+    seed_database(users, results, own)
+    seed_seconds = time.perf_counter() - t0
+    app.config['RESULT_WRITE_BATCH'] = False
+    client = app.test_client()
+    client.post('/login', data={'username': BENCH_USER, 'password': BENCH_PASSWORD})
+    scenarios = {}
+    for generator in ('words', 'model', 'syllable'):
+        for count in (45, 1000):
+            scenarios['http.api_words.%s.n%d' % (generator, count)] = (
+                lambda c, i, g=generator, k=count: c.get('/api/words?generator=%s&count=%d' % (g, k)))
+    scenarios['http.save_result'] = lambda c, i: c.post('/api/save_result', json={
+        'wpm': 50 + i % 40, 'accuracy': 97.5, 'time_seconds': 30, 'chars_typed': 250, 'chars_correct': 244})
+    scenarios['http.my_stats'] = lambda c, i: c.get('/api/my_stats')
+
+    out = {'http.seed_seconds': {'value': seed_seconds, 'unit': 's', 'better': 'info'}}
+    for name, request in scenarios.items():
+        p50, p95, rps = _drive(client, n, request)
+        out[name + '.p50_ms'] = {'value': p50, 'unit': 'ms', 'better': 'lower'}
+        out[name + '.p95_ms'] = {'value': p95, 'unit': 'ms', 'better': 'lower'}
+        out[name + '.rps'] = {'value': rps, 'unit': 'req/s', 'better': 'higher'}
+    return out
+
+
+def main():
+    results = collect(quick='--quick' in sys.argv[1:])
+    for key, r in results.items():
+        print('  {:<40} {:>10.2f} {}'.format(key, r['value'], r['unit']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест /api/save_result: результатов/сек с построчным коммитом и с групповой записью.
+БД создаётся во временном каталоге. Запуск: python benchmarks/bench_save_result.py [threads] [per_thread]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['TIPTYP_DATA'] = tempfile.mkdtemp(prefix='tiptyp-bench-')
+os.environ.setdefault('TIPTYP_WORD_POOLS', '0')
+
+import logging  # noqa: E402
+
+from app import app, db, TypingResult, result_writer  # noqa: E402
+
+logging.getLogger('app').setLevel(logging.WARNING)
+
+
+def _post_results(n, offset):
+    client = app.test_client()
+    for i in range(n):
+        r = client.post('/api/save_result', json={
+            'wpm': 40 + (offset + i) % 60, 'accuracy': 95.0, 'time_seconds': 30,
+            'chars_typed': 200, 'chars_correct': 190,
+        })
+        assert r.status_code == 200, r.data
+
+
+def run(batched, threads, per_thread):
+    app.config['RESULT_WRITE_BATCH'] = batched
+    with app.app_context():
+        before = TypingResult.query.count()
+    workers = [threading.Thread(target=_post_results, args=(per_thread, k * per_thread)) for k in range(threads)]
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    result_writer.drain()
+    elapsed = time.perf_counter() - t0
+    with app.app_context():
+        stored = TypingResult.query.count() - before
+    return stored, stored / elapsed
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    with app.app_context():
+        print('БД: {}, потоков {}, по {} результатов'.format(db.engine.url.database, threads, per_thread))
+    for batched in (False, True):
+        stored, rate = run(batched, threads, per_thread)
+        label = 'групповая запись' if batched else 'коммит на запрос'
+        print('  {:<18} {:>8.0f} результатов/сек ({} записано)'.format(label, rate, stored))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+SQL-запросов на авторизованный запрос с кэшем пользователей и без него (TIPTYP_USER_CACHE_TTL=0).
+БД создаётся во временном каталоге. Запуск: python benchmarks/bench_user_cache.py [requests]
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ['TIPTYP_DATA'] = tempfile.mkdtemp(prefix='tiptyp-bench-')
+os.environ.setdefault('TIPTYP_WORD_POOLS', '0')
+
+import logging  # noqa: E402
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app, db, user_cache  # noqa: E402
+
+logging.getLogger('app').setLevel(logging.WARNING)
+
+_statements = [0]
+
+
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    _statements[0] += 1
+
+
+def run(client, ttl, n):
+    user_cache.ttl = ttl
+    user_cache.clear()
+    _statements[0] = 0
+    t0 = time.perf_counter()
+    for _ in range(n):
+        r = client.get('/api/my_stats')
+        assert r.status_code == 200, r.data
+    elapsed = time.perf_counter() - t0
+    return _statements[0] / n, n / elapsed
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    client = app.test_client()
+    client.post('/register', data={'username': 'bench_user', 'password': 'bench-pass'})
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', _count_statement)
+    print('GET /api/my_stats x {}'.format(n))
+    for label, ttl in (('без кэша', 0), ('с кэшем', 30.0)):
+        per_request, rate = run(client, ttl, n)
+        print('  {:<10} {:>5.2f} SQL/запрос, {:>7.0f} запросов/сек'.format(label, per_request, rate))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Микро-бенчмарк n-граммной модели.
+- Сэмплирование: слов/сек до и после компиляции триграммной модели.
+- Триграммный pickle против trie переменного порядка (Kneser-Ney, mmap) порядков TRIE_ORDERS:
+  размер файла, время загрузки (pickle.load + compile_model против открытия mmap)
+  и время на одно слово.
+Запуск: python benchmarks/bench_word_model.py [count] [корпус.txt]; для JSON и сравнения с базой —
+benchmarks/run.py --only model. Файлы моделей пишутся во временный каталог.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from word_model import (  # noqa: E402
+    TrieModel, compile_model, count_ngrams, count_ngrams_file, generate_one_word, generate_words_from_model,
+    load_model, probs_from_counts, sample_word, save_model, save_trie, train,
+)
+from word_generator import REAL_WORDS, REAL_WORDS_EN  # noqa: E402
+
+TRIE_ORDERS = (3, 5)
+
+
+def _legacy_generate(probs, count):
+    """Прежний путь: generate_one_word по словарю, списки и random.choices на каждый символ."""
+    result = []
+    seen = set()
+    attempts = 0
+    while len(result) < count and attempts < count * 20:
+        w = generate_one_word(probs)
+        attempts += 1
+        if w and w not in seen:
+            seen.add(w)
+            result.append(w)
+    return result
+
+
+def _words_per_sec(fn, repeat=3):
+    best = None
+    produced = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        produced = len(fn())
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return produced, produced / best if best else float('inf')
+
+
+def _best(fn, number, repeat=5):
+    """Секунд на вызов: лучший из repeat замеров по number вызовов."""
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        dt = (time.perf_counter() - t0) / number
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def _corpora(corpus_path=None):
+    """(имя, счётчики n-грамм по порядку) — встроенные списки ru/en и, если задан, файл корпуса."""
+    for lang, words in (('ru', REAL_WORDS), ('en', REAL_WORDS_EN)):
+        yield lang, lambda order, words=words: count_ngrams(words, order)
+    if corpus_path:
+        yield 'corpus', lambda order: count_ngrams_file(corpus_path, order=order)[0]
+
+
+def collect(quick=False, corpus_path=None):
+    """{'имя': {'value', 'unit', 'better'}}: размер, загрузка и слово для pickle и trie каждого порядка."""
+    number = 2000 if quick else 10000
+    tmp = tempfile.mkdtemp(prefix='tiptyp-bench-model-')
+    results = {}
+    rnd = random.Random(1).random
+    for name, counts_for in _corpora(corpus_path):
+        pkl = os.path.join(tmp, '%s.pkl' % name)
+        save_model(probs_from_counts(counts_for(3)), pkl)
+        compiled = compile_model(load_model(pkl))
+        results['model.%s.pickle.bytes' % name] = {'value': os.path.getsize(pkl), 'unit': 'B', 'better': 'lower'}
+        results['model.%s.pickle.load_ms' % name] = {
+            'value': _best(lambda: compile_model(load_model(pkl)), 5) * 1000, 'unit': 'ms', 'better': 'lower'}
+        results['model.%s.pickle.word_us' % name] = {
+            'value': _best(lambda: sample_word(compiled, rnd), number) * 1e6, 'unit': 'us', 'better': 'lower'}
+        for order in TRIE_ORDERS:
+            path = os.path.join(tmp, '%s.%d.trie' % (name, order))
+            save_trie(counts_for(order), order, path)
+            model = TrieModel(path)
+            key = 'model.%s.trie%d' % (name, order)
+            results[key + '.bytes'] = {'value': os.path.getsize(path), 'unit': 'B', 'better': 'lower'}
+            results[key + '.load_ms'] = {
+                'value': _best(lambda: TrieModel(path), 50) * 1000, 'unit': 'ms', 'better': 'lower'}
+            results[key + '.word_us'] = {
+                'value': _best(lambda: model.sample_word(rnd), number) * 1e6, 'unit': 'us', 'better': 'lower'}
+    return results
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    count = int(args[0]) if args else 10000
+    for lang, words in (('ru', REAL_WORDS), ('en', REAL_WORDS_EN)):
+        probs = train(words)
+        t0 = time.perf_counter()
+        compiled = compile_model(probs)
+        compile_ms = (time.perf_counter() - t0) * 1000
+        n_old, old_rate = _words_per_sec(lambda: _legacy_generate(probs, count))
+        n_new, new_rate = _words_per_sec(lambda: generate_words_from_model(compiled, count))
+        print('{}: состояний {}, компиляция {:.2f} мс'.format(lang, len(compiled), compile_ms))
+        print('  до:    {:>10.0f} слов/сек ({} слов)'.format(old_rate, n_old))
+        print('  после: {:>10.0f} слов/сек ({} слов), x{:.1f}'.format(new_rate, n_new, new_rate / old_rate))
+
+    print('\npickle (триграммы) против trie (Kneser-Ney, mmap):')
+    results = collect(quick='--quick' in sys.argv[1:], corpus_path=args[1] if len(args) > 1 else None)
+    for key, r in results.items():
+        print('  {:<36} {:>12.3f} {}'.format(key, r['value'], r['unit']))
+
+
+if __name__ == '__main__':
+    main()
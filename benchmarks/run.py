@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Набор бенчмарков: генераторы слов (bench_generators), форматы модели слов (bench_word_model)
+и HTTP (bench_http), результат — JSON.
+Локально и без сети; БД и модели — во временном каталоге.
+
+  python benchmarks/run.py                        # всё, JSON в benchmarks/results/<время>.json
+  python benchmarks/run.py --quick --only gen     # быстрый прогон одной группы
+  python benchmarks/run.py --save-baseline        # записать результат как базу (benchmarks/baseline.json)
+  python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.25
+
+С базой печатается сравнение; если метрика стала хуже больше чем на threshold, код выхода 1.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+GROUPS = ('gen', 'model', 'http')
+MODULES = {'gen': 'bench_generators', 'model': 'bench_word_model', 'http': 'bench_http'}
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(groups, quick):
+    # Каталог данных задаётся до импорта приложения: бенчмарки не должны трогать рабочую БД
+    os.environ['TIPTYP_BENCH'] = '1'
+    os.environ['TIPTYP_DATA'] = tempfile.mkdtemp(prefix='tiptyp-bench-')
+    os.environ.setdefault('TIPTYP_WORD_POOLS', '0')
+    sys.path.insert(0, HERE)
+    results = {}
+    for group in groups:
+        t0 = time.perf_counter()
+        module = __import__(MODULES[group])
+        results.update(module.collect(quick=quick))
+        print('{}: {} метрик за {:.1f} с'.format(group, len(results), time.perf_counter() - t0))
+    return {
+        'meta': {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'quick': quick,
+            'groups': list(groups),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Печатает изменения относительно базы; возвращает список регрессий."""
+    regressions = []
+    base = baseline.get('results', {})
+    print('{:<42} {:>12} {:>12} {:>8}'.format('метрика', 'база', 'сейчас', 'изм.'))
+    for name, cur in sorted(current['results'].items()):
+        old = base.get(name)
+        if old is None or cur['better'] not in ('lower', 'higher') or not old['value']:
+            continue
+        change = cur['value'] / old['value'] - 1
+        worse = change > threshold if cur['better'] == 'lower' else change < -threshold
+        better = change < -threshold if cur['better'] == 'lower' else change > threshold
+        mark = '  РЕГРЕССИЯ' if worse else ('  лучше' if better else '')
+        print('{:<42} {:>12.4g} {:>12.4g} {:>+7.0f}%{}'.format(name, old['value'], cur['value'], change * 100, mark))
+        if worse:
+            regressions.append(name)
+    missing = sorted(set(base) - set(current['results']))
+    if missing:
+        print('нет в текущем прогоне: {}'.format(', '.join(missing)))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки TipTyp с JSON-результатом и сравнением с базой')
+    parser.add_argument('--only', choices=GROUPS, action='append', help='какие группы запускать (по умолчанию все)')
+    parser.add_argument('--quick', action='store_true', help='меньше повторов и меньше БД — для быстрой проверки')
+    parser.add_argument('--out', help='куда записать JSON (по умолчанию benchmarks/results/<время>.json)')
+    parser.add_argument('--baseline', help='JSON базы для сравнения (по умолчанию benchmarks/baseline.json, если есть)')
+    parser.add_argument('--threshold', type=float, default=0.25, help='допустимое ухудшение, доля (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='записать результат в benchmarks/baseline.json')
+    args = parser.parse_args()
+
+    current = run(args.only or GROUPS, args.quick)
+    out = args.out or os.path.join(HERE, 'results', time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as f:
+        json.dump(current, f, ensure_ascii=False, indent=1, sort_keys=True)
+    print('Результат: {}'.format(out))
+    if args.save_baseline:
+        with open(DEFAULT_BASELINE, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=1, sort_keys=True)
+        print('База обновлена: {}'.format(DEFAULT_BASELINE))
+        return 0
+
+    baseline_path = args.baseline or (DEFAULT_BASELINE if os.path.isfile(DEFAULT_BASELINE) else None)
+    if not baseline_path:
+        return 0
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('quick') != current['meta']['quick']:
+        print('Внимание: база снята в другом режиме (--quick), сравнение неточное')
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print('Регрессий: {} (порог {:.0f}%)'.format(len(regressions), args.threshold * 100))
+        return 1
+    print('Регрессий нет (порог {:.0f}%)'.format(args.threshold * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс для поиска шрифтов по подстроке (/api/fonts) вместо загрузки всего fonts-list.json в браузер.
+Для каждой подстроки длиной до 3 символов хранится список id шрифтов: запрос из 1–3 символов —
+готовый ответ, более длинный — пересечение списков его триграмм с проверкой подстроки.
+Индекс собирается из static/fonts-list.json и кэшируется в instance/fonts-index.json;
+scripts/filter_google_fonts.py пересобирает этот файл после фильтрации списка.
+"""
+import hashlib
+import json
+import os
+
+GRAM = 3
+INDEX_FORMAT = 1
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+FONTS_LIST_PATH = os.path.join(_ROOT, 'static', 'fonts-list.json')
+
+
+def get_index_path():
+    """Путь к файлу индекса. TIPTYP_DATA — каталог данных (Docker), как у модели слов."""
+    base = os.environ.get('TIPTYP_DATA') or _ROOT
+    instance = os.path.join(base, 'instance')
+    if not os.path.isdir(instance):
+        instance = base
+    return os.path.join(instance, 'fonts-index.json')
+
+
+def _grams(text):
+    """Все подстроки длиной 1..GRAM."""
+    out = set()
+    for n in range(1, GRAM + 1):
+        for i in range(len(text) - n + 1):
+            out.add(text[i:i + n])
+    return out
+
+
+def normalize_query(query):
+    """Регистр и лишние пробелы не важны: 'Open  SANS' == 'open sans'."""
+    return ' '.join((query or '').lower().split())
+
+
+class FontIndex(object):
+    """Имена шрифтов + n-граммы -> id в порядке выдачи. version — хеш исходного списка (для ETag)."""
+
+    def __init__(self, names, postings, version):
+        self.names = names
+        self.lower = [n.lower() for n in names]
+        self.postings = postings
+        self.version = version
+
+    @classmethod
+    def build(cls, names, version):
+        names = sorted(set(names), key=lambda n: (n.lower(), n))
+        postings = {}
+        for i, name in enumerate(names):
+            for gram in _grams(name.lower()):
+                postings.setdefault(gram, []).append(i)
+        index = cls(names, postings, version)
+        # Короткий запрос совпадает с ключом списка, поэтому списки сразу хранятся в порядке выдачи
+        for gram, ids in postings.items():
+            ids.sort(key=lambda i: index._rank(i, gram))
+        return index
+
+    def to_json(self):
+        return {'format': INDEX_FORMAT, 'version': self.version, 'names': self.names, 'postings': self.postings}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data['names'], data['postings'], data['version'])
+
+    def _candidates(self, q):
+        if len(q) <= GRAM:
+            return self.postings.get(q, [])
+        lists = []
+        for i in range(len(q) - GRAM + 1):
+            ids = self.postings.get(q[i:i + GRAM])
+            if not ids:
+                return []
+            lists.append(ids)
+        lists.sort(key=len)
+        result = set(lists[0])
+        for ids in lists[1:]:
+            result.intersection_update(ids)
+            if not result:
+                return []
+        # Триграммы есть, но не обязательно подряд — проверяем подстроку
+        return [i for i in result if q in self.lower[i]]
+
+    def _rank(self, i, q):
+        """Точное совпадение, начало имени, начало слова, остальное; затем позиция и длина."""
+        name = self.lower[i]
+        pos = name.find(q)
+        if name == q:
+            kind = 0
+        elif pos == 0:
+            kind = 1
+        elif (' ' + name).find(' ' + q) >= 0:
+            kind = 2
+        else:
+            kind = 3
+        return kind, pos, len(name), i
+
+    def search(self, query, limit=20):
+        """Возвращает (имена, всего найдено). Пустой запрос — первые limit по алфавиту."""
+        q = normalize_query(query)
+        if not q:
+            return self.names[:limit], len(self.names)
+        ids = self._candidates(q)
+        ranked = ids if len(q) <= GRAM else sorted(ids, key=lambda i: self._rank(i, q))
+        return [self.names[i] for i in ranked[:limit]], len(ids)
+
+
+def _list_version(raw):
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def build_index_file(list_path=FONTS_LIST_PATH, index_path=None):
+    """Собирает индекс из fonts-list.json и атомарно пишет его в файл. Возвращает FontIndex."""
+    index_path = index_path or get_index_path()
+    with open(list_path, 'rb') as f:
+        raw = f.read()
+    index = FontIndex.build(json.loads(raw.decode('utf-8')), _list_version(raw))
+    tmp = '%s.%d.tmp' % (index_path, os.getpid())
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(index.to_json(), f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, index_path)
+    return index
+
+
+def load_index(list_path=FONTS_LIST_PATH, index_path=None):
+    """
+    Индекс из файла, если он собран по текущему fonts-list.json; иначе пересобирает и сохраняет.
+    Если файл записать нельзя, индекс всё равно строится в памяти.
+    """
+    index_path = index_path or get_index_path()
+    with open(list_path, 'rb') as f:
+        raw = f.read()
+    version = _list_version(raw)
+    try:
+        with open(index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') == INDEX_FORMAT and data.get('version') == version:
+            return FontIndex.from_json(data)
+    except (OSError, ValueError, KeyError):
+        pass
+    try:
+        return build_index_file(list_path, index_path)
+    except OSError:
+        return FontIndex.build(json.loads(raw.decode('utf-8')), version)
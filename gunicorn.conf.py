@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+Настройки gunicorn (читаются автоматически из текущего каталога).
+post_fork: при --preload приложение импортировано в мастере, и поток записи логов
+остался там — воркеру заводится свой. Без --preload app ещё не импортирован, и хук
+ничего не делает: слушатель создастся при импорте в воркере.
+"""
+import sys
+
+
+def post_fork(server, worker):
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.restart_log_listener()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики процесса в текстовом формате Prometheus (/metrics): счётчики и гистограммы с метками.
+Без внешних зависимостей; каждое наблюдение — один захват lock и bisect по границам корзин,
+поэтому метрики можно не выключать в продакшене. Значения — на процесс: у каждого воркера gunicorn свои.
+"""
+import threading
+from bisect import bisect_left
+
+# Границы по умолчанию (секунды): от долей миллисекунды до секунд
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels_text(names, values, extra=None):
+    pairs = ['%s="%s"' % (n, _escape(v)) for n, v in zip(names, values)]
+    if extra:
+        pairs.append('%s="%s"' % extra)
+    return '{%s}' % ','.join(pairs) if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter(object):
+    """Монотонный счётчик: inc(метки..., amount=1)."""
+
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return ['%s%s %s' % (self.name, _labels_text(self.labelnames, k), _number(v)) for k, v in items]
+
+
+class Histogram(object):
+    """Гистограмма: observe(метки..., value=секунды). Корзины хранятся некумулятивно, суммируются при выводе."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, *labels):
+        state = self._values.get(labels)
+        return state[2] if state else 0
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for labels, (counts, total, n) in items:
+            running = 0
+            for bound, c in zip(self.buckets + (float('inf'),), counts):
+                running += c
+                lines.append('%s_bucket%s %d' % (
+                    self.name, _labels_text(self.labelnames, labels, ('le', _number(float(bound)))), running))
+            lines.append('%s_sum%s %r' % (self.name, _labels_text(self.labelnames, labels), total))
+            lines.append('%s_count%s %d' % (self.name, _labels_text(self.labelnames, labels), n))
+        return lines
+
+
+class Registry(object):
+    """
+    Набор метрик. Кроме своих счётчиков принимает collectors — функции без аргументов,
+    возвращающие [(имя, тип, описание, {метки: значение})]: так выводятся уже существующие
+    счётчики (кэш пользователей, пулы слов) без переноса их в этот модуль.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def render(self):
+        lines = []
+        for m in list(self._metrics):
+            lines.append('# HELP %s %s' % (m.name, m.help))
+            lines.append('# TYPE %s %s' % (m.name, m.kind))
+            lines.extend(m.render())
+        for fn in list(self._collectors):
+            for name, kind, help_text, samples in fn():
+                lines.append('# HELP %s %s' % (name, help_text))
+                lines.append('# TYPE %s %s' % (name, kind))
+                for labels, value in sorted(samples.items()):
+                    names = [k for k, _ in labels]
+                    values = [v for _, v in labels]
+                    lines.append('%s%s %s' % (name, _labels_text(names, values), _number(value)))
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
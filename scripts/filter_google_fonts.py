@@ -2,6 +2,8 @@
 """
 Оставляет в static/fonts-list.json только шрифты, которые есть в каталоге Google Fonts.
 Список Google Fonts берётся из github.com/jonathantneal/google-fonts-complete.
+После фильтрации пересобирает индекс поиска для /api/fonts (instance/fonts-index.json).
+С флагом --index-only только пересобирает индекс по текущему списку, без загрузки.
 """
 import json
 import os
@@ -9,6 +11,10 @@ import sys
 import urllib.request
 
 ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from font_index import build_index_file, get_index_path  # noqa: E402
+
 LIST_PATH = os.path.join(ROOT, 'static', 'fonts-list.json')
 GOOGLE_FONTS_JSON_URL = 'https://raw.githubusercontent.com/jonathantneal/google-fonts-complete/master/google-fonts.json'
 
@@ -25,7 +31,15 @@ def fetch_google_font_names():
     return set()
 
 
+def rebuild_index():
+    index = build_index_file(LIST_PATH)
+    print('Индекс поиска: {} шрифтов, {} n-грамм -> {}'.format(len(index.names), len(index.postings), get_index_path()))
+
+
 def main():
+    if '--index-only' in sys.argv[1:]:
+        rebuild_index()
+        return
     with open(LIST_PATH, 'r', encoding='utf-8') as f:
         fonts = json.load(f)
     if not isinstance(fonts, list):
@@ -41,6 +55,7 @@ def main():
     print('Готово. Оставлено: {}, убрано: {}'.format(len(valid), len(removed)))
     if removed:
         print('Удалённые (нет в Google Fonts):', ', '.join(sorted(removed)[:40]) + (' ...' if len(removed) > 40 else ''))
+    rebuild_index()
 
 
 if __name__ == '__main__':
@@ -14,6 +14,14 @@
     var visualKeyboard = document.getElementById('visualKeyboard');
 
     var words = [];
+    /* Большие тесты грузятся страницами: первая сразу, следующие — по мере набора */
+    var WORDS_PAGE_SIZE = 200;
+    var wordsTotal = 0;
+    var wordsNextOffset = null;
+    /* seed последовательности из ответа на первую страницу: следующие страницы её продолжают */
+    var wordsSeed = null;
+    var wordsLoadingMore = false;
+    var wordsRequestId = 0;
 
     /* Раскладка как на картинке: ряд 1 — цифры + Backspace; 2 — Tab + буквы + \; 3 — Caps + буквы + Enter; 4 — Shift + буквы + Shift; 5 — Copy, Clear, En, Пробел, Ru, Layout, Spell */
     var KEYBOARD_ROWS = [
@@ -142,23 +150,31 @@
             ? Math.max(1, Math.min(10000, parseInt(countOverride, 10) || 1))
             : getWordCount();
         var generator = getGenerator();
-        fetch('/api/words?count=' + count + '&generator=' + encodeURIComponent(generator) + '&lang=' + encodeURIComponent(lang))
+        var requestId = ++wordsRequestId;
+        var url = wordsUrl(count, generator, lang);
+        if (count > WORDS_PAGE_SIZE) url += '&offset=0&limit=' + WORDS_PAGE_SIZE;
+        wordsNextOffset = null;
+        wordsSeed = null;
+        wordsLoadingMore = false;
+        fetch(url)
             .then(function (r) { return r.json(); })
             .then(function (data) {
+                if (requestId !== wordsRequestId) return;
                 if (data.words && data.words.length > 0) {
                     words = data.words;
                 } else {
                     words = [];
                 }
+                wordsTotal = data.total || words.length;
+                wordsNextOffset = data.next_offset != null ? data.next_offset : null;
+                wordsSeed = data.seed || null;
                 if (words.length === 0) {
                     var errMsg = data.error ? (data.error + '. ') : '';
                     typingWords.innerHTML = '<span class="loading-words">' + errMsg + errorHint + '</span>';
                     if (typeof done === 'function') done();
                     return;
                 }
-                typingWords.innerHTML = words.map(function (w, i) {
-                    return '<span class="word" data-idx="' + i + '">' + escapeHtml(w) + '</span>';
-                }).join(' ');
+                typingWords.innerHTML = wordSpansHtml(words, 0);
                 var first = typingWords.querySelector('.word');
                 if (first) first.classList.add('current');
                 typingInput.disabled = false;
@@ -171,6 +187,7 @@
                 if (typeof done === 'function') done();
             })
             .catch(function (err) {
+                if (requestId !== wordsRequestId) return;
                 typingWords.innerHTML = '<span class="loading-words">' + (getLang() === 'en' ? 'Load error. Try «Syllables» or refresh.' : 'Ошибка загрузки. Попробуйте «Слоги» или обновите страницу.') + '</span>';
                 typingInput.disabled = false;
                 if (typeof window.applyTipTypFont === 'function') window.applyTipTypFont();
@@ -178,6 +195,76 @@
             });
     }
 
+    function wordsUrl(count, generator, lang) {
+        var url = '/api/words?count=' + count + '&generator=' + encodeURIComponent(generator) + '&lang=' + encodeURIComponent(lang);
+        if (generator === 'practice') {
+            /* Для гостя — слабые буквы из браузера; у вошедшего сервер берёт их из статистики */
+            var stored = loadLetterErrors();
+            var letters = Object.keys(stored).sort(function (a, b) { return stored[b] - stored[a]; }).slice(0, 8);
+            if (letters.length > 0) {
+                url += '&letters=' + encodeURIComponent(letters.map(function (c) { return c + ':' + stored[c]; }).join(','));
+            }
+        }
+        return url;
+    }
+
+    var LETTER_ERRORS_KEY = 'tiptyp_letter_errors';
+
+    function loadLetterErrors() {
+        try { return JSON.parse(localStorage.getItem(LETTER_ERRORS_KEY) || '{}') || {}; } catch (e) { return {}; }
+    }
+
+    /* Копит ошибки по буквам в браузере (для режима «работа над ошибками» без входа), хранит 16 самых частых */
+    function storeLetterErrors(letterErrors) {
+        var stored = loadLetterErrors();
+        Object.keys(letterErrors).forEach(function (c) {
+            stored[c] = Math.min(10000, (stored[c] || 0) + letterErrors[c]);
+        });
+        var keep = {};
+        Object.keys(stored).sort(function (a, b) { return stored[b] - stored[a]; }).slice(0, 16).forEach(function (c) {
+            keep[c] = stored[c];
+        });
+        try { localStorage.setItem(LETTER_ERRORS_KEY, JSON.stringify(keep)); } catch (e) {}
+    }
+
+    function wordSpansHtml(list, startIdx) {
+        return list.map(function (w, i) {
+            return '<span class="word" data-idx="' + (startIdx + i) + '">' + escapeHtml(w) + '</span>';
+        }).join(' ');
+    }
+
+    function hasMoreWords() {
+        return wordsNextOffset !== null;
+    }
+
+    /* Догружает следующую страницу, когда до конца загруженных слов осталось меньше половины страницы */
+    function maybeLoadMoreWords() {
+        if (!hasMoreWords() || wordsLoadingMore) return;
+        if (getCompletedCount() < words.length - WORDS_PAGE_SIZE / 2) return;
+        wordsLoadingMore = true;
+        var requestId = wordsRequestId;
+        var offset = wordsNextOffset;
+        fetch(wordsUrl(wordsTotal, getGenerator(), getLang()) + '&seed=' + encodeURIComponent(wordsSeed || '') + '&offset=' + offset + '&limit=' + WORDS_PAGE_SIZE)
+            .then(function (r) { return r.json(); })
+            .then(function (data) {
+                if (requestId !== wordsRequestId) return;
+                wordsLoadingMore = false;
+                var more = data.words || [];
+                if (more.length === 0) {
+                    wordsNextOffset = null;
+                    return;
+                }
+                typingWords.insertAdjacentHTML('beforeend', ' ' + wordSpansHtml(more, words.length));
+                words = words.concat(more);
+                wordsNextOffset = data.next_offset != null ? data.next_offset : null;
+                highlightWords();
+                if (typeof window.applyTipTypFont === 'function') window.applyTipTypFont();
+            })
+            .catch(function () {
+                if (requestId === wordsRequestId) wordsLoadingMore = false;
+            });
+    }
+
     function escapeHtml(s) {
         var div = document.createElement('div');
         div.textContent = s;
@@ -320,14 +407,15 @@
         showResult();
     }
 
+    /* Отчёт после теста: { html, wrongByLetter } — ошибки по буквам (только буквы, в нижнем регистре) уходят и в save_result */
     function buildTypingReport() {
         var expected = words.join(' ');
         var actual = typingInput.value;
         var wrongByLetter = {};
         var i;
         for (i = 0; i < actual.length && i < expected.length; i++) {
-            if (actual[i] !== expected[i]) {
-                var ch = expected[i];
+            var ch = expected[i].toLowerCase();
+            if (actual[i] !== expected[i] && ch !== ch.toUpperCase()) {
                 wrongByLetter[ch] = (wrongByLetter[ch] || 0) + 1;
             }
         }
@@ -360,7 +448,7 @@
         } else if (wordsWrongList.length > 15) {
             reportHtml += '<div class="report-section"><strong>' + (isEn ? 'Words with errors:' : 'Слова с ошибками:') + '</strong> ' + wordsWrongList.length + (isEn ? ' words.' : ' слов.') + '</div>';
         }
-        return reportHtml;
+        return { html: reportHtml, wrongByLetter: wrongByLetter };
     }
 
     function showResult() {
@@ -377,8 +465,14 @@
             ? ('<p><strong>Words per minute:</strong> ' + wpm + '</p><p><strong>Characters per minute:</strong> ' + cpm + '</p><p><strong>Accuracy:</strong> ' + acc + '%</p><p><strong>Time:</strong> ' + timeLabel + '</p><p><strong>Words typed:</strong> ' + wordCount + '</p>')
             : ('<p><strong>Слов в минуту:</strong> ' + wpm + '</p><p><strong>Знаков в минуту:</strong> ' + cpm + '</p><p><strong>Точность:</strong> ' + acc + '%</p><p><strong>Время:</strong> ' + timeLabel + '</p><p><strong>Слов набрано:</strong> ' + wordCount + '</p>');
 
-        if (resultReport) resultReport.innerHTML = buildTypingReport();
+        var report = buildTypingReport();
+        if (resultReport) resultReport.innerHTML = report.html;
         resultSave.textContent = '';
+        var letterErrors = report.wrongByLetter;
+        storeLetterErrors(letterErrors);
+        var clientKey = window.crypto && window.crypto.randomUUID
+            ? window.crypto.randomUUID()
+            : (Date.now().toString(36) + Math.random().toString(36).slice(2));
         fetch('/api/save_result', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
@@ -388,7 +482,9 @@
                 accuracy: acc,
                 time_seconds: timeSec,
                 chars_typed: totalTypedChars,
-                chars_correct: totalCorrectChars
+                chars_correct: totalCorrectChars,
+                letter_errors: letterErrors,
+                client_key: clientKey
             })
         })
             .then(function (r) { return r.json(); })
@@ -451,9 +547,11 @@
         updateAccuracy();
         highlightWords();
         var w = countCompletedWords();
-        if (w >= words.length) {
+        if (w >= words.length && !hasMoreWords()) {
             stopTest();
+            return;
         }
+        maybeLoadMoreWords();
     }
 
     typingInput.addEventListener('input', onTypingInput);
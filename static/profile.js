@@ -25,6 +25,7 @@
 
     // ——— Theme ———
     function setTheme(id) {
+        window.tiptypLoadTheme(id);
         document.body.dataset.theme = id;
         try { localStorage.setItem(STORAGE_KEY, id); } catch (e) {}
         document.querySelectorAll('.theme-card.active').forEach(function (el) { el.classList.remove('active'); });
@@ -35,6 +36,20 @@
     try { storedTheme = localStorage.getItem(STORAGE_KEY) || 'dark1'; } catch (e) { storedTheme = 'dark1'; }
     if (document.body.dataset.theme) storedTheme = document.body.dataset.theme;
     setTheme(storedTheme);
+    // Превью: CSS темы подгружается, когда карточка появляется на экране
+    var themeCards = document.querySelectorAll('.theme-card');
+    if ('IntersectionObserver' in window) {
+        var themeObserver = new IntersectionObserver(function (entries) {
+            entries.forEach(function (entry) {
+                if (!entry.isIntersecting) return;
+                window.tiptypLoadTheme(entry.target.getAttribute('data-theme'));
+                themeObserver.unobserve(entry.target);
+            });
+        }, { rootMargin: '200px' });
+        themeCards.forEach(function (card) { themeObserver.observe(card); });
+    } else {
+        themeCards.forEach(function (card) { window.tiptypLoadTheme(card.getAttribute('data-theme')); });
+    }
     document.querySelectorAll('.profile-content .theme-card').forEach(function (btn) {
         btn.addEventListener('click', function () {
             setTheme(this.getAttribute('data-theme'));
@@ -56,7 +71,6 @@
         var cur = document.getElementById('profileFontCurrent');
         if (cur) cur.textContent = fontName;
     }
-    var fontList = [];
     var searchEl = document.getElementById('profileFontSearch');
     var dropEl = document.getElementById('profileFontDropdown');
     var currentEl = document.getElementById('profileFontCurrent');
@@ -65,40 +79,49 @@
     var storedFont = getStoredFont();
     if (currentEl) currentEl.textContent = storedFont || '—';
 
-    fetch('/static/fonts-list.json')
-        .then(function (r) { return r.json(); })
-        .then(function (arr) {
-            fontList = arr;
-            if (searchEl) {
-                searchEl.addEventListener('focus', function () {
-                    searchEl.dispatchEvent(new Event('input'));
-                    dropEl.hidden = false;
-                });
-                searchEl.addEventListener('input', function () {
-                    var q = (searchEl.value || '').trim().toLowerCase();
-                    var list = q ? fontList.filter(function (f) { return f.toLowerCase().indexOf(q) >= 0; }) : fontList;
-                    var show = list.slice(0, 80);
-                    dropEl.innerHTML = '';
-                    dropEl.hidden = show.length === 0 && !q;
-                    show.forEach(function (name) {
-                        var div = document.createElement('div');
-                        div.className = 'font-option';
-                        div.textContent = name;
-                        div.addEventListener('click', function () {
-                            setFont(name);
-                            searchEl.value = '';
-                            dropEl.hidden = true;
-                            dropEl.innerHTML = '';
-                        });
-                        dropEl.appendChild(div);
-                    });
-                });
-                searchEl.addEventListener('blur', function () {
-                    setTimeout(function () { dropEl.hidden = true; }, 200);
-                });
-            }
-        })
-        .catch(function () {});
+    // Поиск на сервере (/api/fonts): в браузер приходят только подходящие шрифты, а не весь список
+    var FONTS_LIMIT = 80;
+    var fontSearchTimer = null;
+    var fontSearchSeq = 0;
+    function renderFonts(names, q) {
+        dropEl.innerHTML = '';
+        dropEl.hidden = names.length === 0 && !q;
+        names.forEach(function (name) {
+            var div = document.createElement('div');
+            div.className = 'font-option';
+            div.textContent = name;
+            div.addEventListener('click', function () {
+                setFont(name);
+                searchEl.value = '';
+                dropEl.hidden = true;
+                dropEl.innerHTML = '';
+            });
+            dropEl.appendChild(div);
+        });
+    }
+    function searchFonts() {
+        var q = (searchEl.value || '').trim();
+        var seq = ++fontSearchSeq;
+        fetch('/api/fonts?limit=' + FONTS_LIMIT + '&q=' + encodeURIComponent(q))
+            .then(function (r) { return r.json(); })
+            .then(function (data) {
+                if (seq === fontSearchSeq) renderFonts(data.fonts || [], q);
+            })
+            .catch(function () {});
+    }
+    if (searchEl && dropEl) {
+        searchEl.addEventListener('focus', function () {
+            searchFonts();
+            dropEl.hidden = false;
+        });
+        searchEl.addEventListener('input', function () {
+            clearTimeout(fontSearchTimer);
+            fontSearchTimer = setTimeout(searchFonts, 120);
+        });
+        searchEl.addEventListener('blur', function () {
+            setTimeout(function () { dropEl.hidden = true; }, 200);
+        });
+    }
 
     // ——— Stats (load when tab opened) ———
     function formatDate(iso) {
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""Длина слов модели переменного порядка: python -m pytest tests"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from word_generator import REAL_WORDS  # noqa: E402
+from word_model import (  # noqa: E402
+    MAX_WORD_LEN, MIN_WORD_LEN, TrieModel, count_ngrams, generate_words_from_model, save_trie,
+)
+
+
+def _trie(tmp_path, words, order=3):
+    path = str(tmp_path / 'model.trie')
+    save_trie(count_ngrams(words, order), order, path)
+    return TrieModel(path)
+
+
+def _assert_bounds(words):
+    assert words
+    for w in words:
+        assert MIN_WORD_LEN <= len(w) <= MAX_WORD_LEN, w
+
+
+def test_trie_words_within_length_bounds(tmp_path):
+    model = _trie(tmp_path, REAL_WORDS, order=4)
+    rng = random.Random(1)
+    words = generate_words_from_model(model, 500, rng)
+    assert len(words) == 500
+    _assert_bounds(words)
+
+
+def test_trie_length_bounds_when_rejection_fails(tmp_path):
+    # Почти все слова корпуса короче MIN_WORD_LEN, остальные длиннее MAX_WORD_LEN:
+    # отбраковка почти никогда не принимает слово, и срабатывает запасной путь
+    words = list('abcdefgh') * 50 + ['abcdefghijklmnopqrstuvwxyz']
+    model = _trie(tmp_path, words)
+    rnd = random.Random(2).random
+    samples = [model.sample_word(rnd) for _ in range(300)]
+    assert None not in samples
+    _assert_bounds(samples)
+    _assert_bounds(generate_words_from_model(model, 45, random.Random(3)))
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+"""
+Темы оформления: CSS-переменные для каждой темы по её id (dark1–dark50, light1–light50).
+Тема по умолчанию (dark1) лежит в static/style.css; остальные отдаются по одной через
+/theme/<версия>/<id>.css — страница грузит только выбранную тему, а не все 100.
+Темы 6–50 вычисляются из номера, 2–5 (и light1–5) заданы вручную.
+"""
+import hashlib
+from functools import lru_cache
+
+DEFAULT_THEME = 'dark1'
+THEMES_PER_KIND = 50
+
+# Ручные темы: переменные в порядке вывода
+_HANDMADE = {
+    'dark2': (
+        ('--bg', '#1a1d24'),
+        ('--bg-sub', '#22262e'),
+        ('--surface', '#2c313a'),
+        ('--text', '#e2e4e8'),
+        ('--text-muted', '#7d8490'),
+        ('--accent', '#3498db'),
+        ('--accent-dim', '#2980b9'),
+        ('--success', '#2ecc71'),
+        ('--error', '#e74c3c'),
+        ('--on-accent', '#1a1a1a'),
+        ('--success-bg', 'rgba(46, 204, 113, 0.2)'),
+        ('--error-bg', 'rgba(231, 76, 60, 0.2)'),
+        ('--success-bg-dim', 'rgba(46, 204, 113, 0.12)'),
+        ('--accent-bg-dim', 'rgba(52, 152, 219, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.75)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.3)'),
+        ('--keyboard-panel', '#1c1f26'),
+        ('--key-face', '#e4e6eb'),
+        ('--key-face-text', '#1a1a1a'),
+        ('--key-border', '#4a5060'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.45)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.35)'),
+    ),
+    'dark3': (
+        ('--bg', '#1e1b2e'),
+        ('--bg-sub', '#252238'),
+        ('--surface', '#2f2b44'),
+        ('--text', '#e8e6f0'),
+        ('--text-muted', '#8a86a0'),
+        ('--accent', '#9b59b6'),
+        ('--accent-dim', '#8e44ad'),
+        ('--success', '#2ecc71'),
+        ('--error', '#e74c3c'),
+        ('--on-accent', '#fff'),
+        ('--success-bg', 'rgba(46, 204, 113, 0.2)'),
+        ('--error-bg', 'rgba(231, 76, 60, 0.2)'),
+        ('--success-bg-dim', 'rgba(46, 204, 113, 0.12)'),
+        ('--accent-bg-dim', 'rgba(155, 89, 182, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.8)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.35)'),
+        ('--keyboard-panel', '#1f1c2c'),
+        ('--key-face', '#e8e6f2'),
+        ('--key-face-text', '#1a1a22'),
+        ('--key-border', '#5a5670'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.5)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.3)'),
+    ),
+    'dark4': (
+        ('--bg', '#2a2520'),
+        ('--bg-sub', '#352e28'),
+        ('--surface', '#423a32'),
+        ('--text', '#e5dfd8'),
+        ('--text-muted', '#9a9086'),
+        ('--accent', '#e67e22'),
+        ('--accent-dim', '#d35400'),
+        ('--success', '#27ae60'),
+        ('--error', '#c0392b'),
+        ('--on-accent', '#1a1a1a'),
+        ('--success-bg', 'rgba(39, 174, 96, 0.2)'),
+        ('--error-bg', 'rgba(192, 57, 43, 0.2)'),
+        ('--success-bg-dim', 'rgba(39, 174, 96, 0.12)'),
+        ('--accent-bg-dim', 'rgba(230, 126, 34, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.75)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.3)'),
+        ('--keyboard-panel', '#2d2620'),
+        ('--key-face', '#ebe6df'),
+        ('--key-face-text', '#1a1816'),
+        ('--key-border', '#6b6056'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.5)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.3)'),
+    ),
+    'dark5': (
+        ('--bg', '#0d0d0d'),
+        ('--bg-sub', '#1a1a1a'),
+        ('--surface', '#262626'),
+        ('--text', '#e0e0e0'),
+        ('--text-muted', '#737373'),
+        ('--accent', '#f39c12'),
+        ('--accent-dim', '#e67e22'),
+        ('--success', '#2ecc71'),
+        ('--error', '#e74c3c'),
+        ('--on-accent', '#1a1a1a'),
+        ('--success-bg', 'rgba(46, 204, 113, 0.2)'),
+        ('--error-bg', 'rgba(231, 76, 60, 0.2)'),
+        ('--success-bg-dim', 'rgba(46, 204, 113, 0.12)'),
+        ('--accent-bg-dim', 'rgba(243, 156, 18, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.85)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.4)'),
+        ('--keyboard-panel', '#141414'),
+        ('--key-face', '#e0e0e0'),
+        ('--key-face-text', '#0d0d0d'),
+        ('--key-border', '#4a4a4a'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.4)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.4)'),
+    ),
+    'light1': (
+        ('--bg', '#f5f5f5'),
+        ('--bg-sub', '#ffffff'),
+        ('--surface', '#e8e8e8'),
+        ('--text', '#2d2d2d'),
+        ('--text-muted', '#6b6b6b'),
+        ('--accent', '#27ae60'),
+        ('--accent-dim', '#219a52'),
+        ('--success', '#27ae60'),
+        ('--error', '#c0392b'),
+        ('--on-accent', '#fff'),
+        ('--success-bg', 'rgba(39, 174, 96, 0.18)'),
+        ('--error-bg', 'rgba(192, 57, 43, 0.18)'),
+        ('--success-bg-dim', 'rgba(39, 174, 96, 0.12)'),
+        ('--accent-bg-dim', 'rgba(39, 174, 96, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.5)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.15)'),
+        ('--keyboard-panel', '#c8c8c8'),
+        ('--key-face', '#ffffff'),
+        ('--key-face-text', '#1a1a1a'),
+        ('--key-border', '#9a9a9a'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.9)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.18)'),
+    ),
+    'light2': (
+        ('--bg', '#f0f4f8'),
+        ('--bg-sub', '#ffffff'),
+        ('--surface', '#e2e8f0'),
+        ('--text', '#1a202c'),
+        ('--text-muted', '#718096'),
+        ('--accent', '#3182ce'),
+        ('--accent-dim', '#2b6cb0'),
+        ('--success', '#276749'),
+        ('--error', '#c53030'),
+        ('--on-accent', '#fff'),
+        ('--success-bg', 'rgba(39, 103, 73, 0.15)'),
+        ('--error-bg', 'rgba(197, 48, 48, 0.15)'),
+        ('--success-bg-dim', 'rgba(39, 103, 73, 0.1)'),
+        ('--accent-bg-dim', 'rgba(49, 130, 206, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.45)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.12)'),
+        ('--keyboard-panel', '#b8c4d4'),
+        ('--key-face', '#ffffff'),
+        ('--key-face-text', '#1a202c'),
+        ('--key-border', '#8a9ab0'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.95)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.14)'),
+    ),
+    'light3': (
+        ('--bg', '#faf8f5'),
+        ('--bg-sub', '#fffefb'),
+        ('--surface', '#f0ebe3'),
+        ('--text', '#3d3630'),
+        ('--text-muted', '#7a6f65'),
+        ('--accent', '#b8860b'),
+        ('--accent-dim', '#996f09'),
+        ('--success', '#2d6a2d'),
+        ('--error', '#a52a2a'),
+        ('--on-accent', '#1a1a1a'),
+        ('--success-bg', 'rgba(45, 106, 45, 0.15)'),
+        ('--error-bg', 'rgba(165, 42, 42, 0.15)'),
+        ('--success-bg-dim', 'rgba(45, 106, 45, 0.1)'),
+        ('--accent-bg-dim', 'rgba(184, 134, 11, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.4)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.12)'),
+        ('--keyboard-panel', '#d8d0c4'),
+        ('--key-face', '#fffefb'),
+        ('--key-face-text', '#3d3630'),
+        ('--key-border', '#a89a88'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.9)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.15)'),
+    ),
+    'light4': (
+        ('--bg', '#e8e8e8'),
+        ('--bg-sub', '#ffffff'),
+        ('--surface', '#d0d0d0'),
+        ('--text', '#1f1f1f'),
+        ('--text-muted', '#5a5a5a'),
+        ('--accent', '#16a085'),
+        ('--accent-dim', '#138d75'),
+        ('--success', '#27ae60'),
+        ('--error', '#c0392b'),
+        ('--on-accent', '#fff'),
+        ('--success-bg', 'rgba(39, 174, 96, 0.18)'),
+        ('--error-bg', 'rgba(192, 57, 43, 0.18)'),
+        ('--success-bg-dim', 'rgba(39, 174, 96, 0.12)'),
+        ('--accent-bg-dim', 'rgba(22, 160, 133, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.5)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.18)'),
+        ('--keyboard-panel', '#b8b8b8'),
+        ('--key-face', '#ffffff'),
+        ('--key-face-text', '#1f1f1f'),
+        ('--key-border', '#888888'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.9)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.2)'),
+    ),
+    'light5': (
+        ('--bg', '#f8f6fc'),
+        ('--bg-sub', '#ffffff'),
+        ('--surface', '#ede9f5'),
+        ('--text', '#2d2a35'),
+        ('--text-muted', '#6b6578'),
+        ('--accent', '#7c3aed'),
+        ('--accent-dim', '#6d28d9'),
+        ('--success', '#059669'),
+        ('--error', '#dc2626'),
+        ('--on-accent', '#fff'),
+        ('--success-bg', 'rgba(5, 150, 105, 0.15)'),
+        ('--error-bg', 'rgba(220, 38, 38, 0.15)'),
+        ('--success-bg-dim', 'rgba(5, 150, 105, 0.1)'),
+        ('--accent-bg-dim', 'rgba(124, 58, 237, 0.12)'),
+        ('--overlay', 'rgba(0, 0, 0, 0.45)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.12)'),
+        ('--keyboard-panel', '#d4cee0'),
+        ('--key-face', '#ffffff'),
+        ('--key-face-text', '#2d2a35'),
+        ('--key-border', '#9a92b0'),
+        ('--key-highlight', 'rgba(255, 255, 255, 0.95)'),
+        ('--key-shadow', 'rgba(0, 0, 0, 0.12)'),
+    ),
+}
+
+
+def _dark_vars(i):
+    hue = (i * 137) % 360  # золотой угол для разнообразия
+    sat_accent = 55 + (i % 3) * 10
+    light_accent = 45 + (i % 5) * 6
+    bg_light = 10 + (i % 7)
+    return (
+        ('--bg', 'hsl({}, 12%, {}%)'.format(hue, bg_light)),
+        ('--bg-sub', 'hsl({}, 10%, {}%)'.format(hue, bg_light + 4)),
+        ('--surface', 'hsl({}, 11%, {}%)'.format(hue, bg_light + 8)),
+        ('--text', 'hsl(0, 0%, 88%)'),
+        ('--text-muted', 'hsl(0, 0%, 58%)'),
+        ('--accent', 'hsl({}, {}%, {}%)'.format(hue, sat_accent, light_accent)),
+        ('--accent-dim', 'hsl({}, {}%, {}%)'.format(hue, sat_accent, max(30, light_accent - 12))),
+        ('--success', '#2ecc71'),
+        ('--error', '#e74c3c'),
+        ('--on-accent', '#1a1a1a' if light_accent > 50 else '#fff'),
+        ('--success-bg', 'rgba(46, 204, 113, 0.2)'),
+        ('--error-bg', 'rgba(231, 76, 60, 0.2)'),
+        ('--success-bg-dim', 'rgba(46, 204, 113, 0.12)'),
+        ('--accent-bg-dim', 'hsl({}, {}%, {}%)'.format(hue, sat_accent, 20)),
+        ('--overlay', 'rgba(0, 0, 0, 0.75)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.35)'),
+    )
+
+
+def _light_vars(i):
+    hue = (i * 137 + 180) % 360
+    sat_accent = 50 + (i % 4) * 12
+    light_accent = 38 + (i % 4) * 5
+    bg_light = 96 - (i % 5)
+    return (
+        ('--bg', 'hsl(0, 0%, {}%)'.format(bg_light)),
+        ('--bg-sub', '#ffffff'),
+        ('--surface', 'hsl(0, 0%, {}%)'.format(bg_light - 8)),
+        ('--text', 'hsl(0, 0%, 18%)'),
+        ('--text-muted', 'hsl(0, 0%, 45%)'),
+        ('--accent', 'hsl({}, {}%, {}%)'.format(hue, sat_accent, light_accent)),
+        ('--accent-dim', 'hsl({}, {}%, {}%)'.format(hue, sat_accent, max(28, light_accent - 10))),
+        ('--success', '#27ae60'),
+        ('--error', '#c0392b'),
+        ('--on-accent', '#fff'),
+        ('--success-bg', 'rgba(39, 174, 96, 0.15)'),
+        ('--error-bg', 'rgba(192, 57, 43, 0.15)'),
+        ('--success-bg-dim', 'rgba(39, 174, 96, 0.1)'),
+        ('--accent-bg-dim', 'hsl({}, 70%, 92%)'.format(hue)),
+        ('--overlay', 'rgba(0, 0, 0, 0.45)'),
+        ('--shadow', '0 4px 12px rgba(0, 0, 0, 0.12)'),
+    )
+
+
+def _parse_id(theme_id):
+    """'dark17' -> ('dark', 17); None, если такой темы нет."""
+    for kind in ('dark', 'light'):
+        if theme_id.startswith(kind):
+            num = theme_id[len(kind):]
+            if num.isascii() and num.isdigit() and not num.startswith('0') and 1 <= int(num) <= THEMES_PER_KIND:
+                return kind, int(num)
+    return None
+
+
+def theme_ids():
+    return ['%s%d' % (kind, i) for kind in ('dark', 'light') for i in range(1, THEMES_PER_KIND + 1)]
+
+
+def theme_vars(theme_id):
+    """Пары (переменная, значение) темы; None для неизвестного id и для темы по умолчанию."""
+    parsed = _parse_id(theme_id)
+    if parsed is None or theme_id == DEFAULT_THEME:
+        return None
+    if theme_id in _HANDMADE:
+        return _HANDMADE[theme_id]
+    kind, i = parsed
+    return _dark_vars(i) if kind == 'dark' else _light_vars(i)
+
+
+def _build_css(theme_id):
+    pairs = theme_vars(theme_id)
+    if pairs is None:
+        return '/* %s — тема по умолчанию, уже в style.css */\n' % theme_id
+    body = '\n'.join('    %s: %s;' % pair for pair in pairs)
+    return '[data-theme="%s"] {\n%s\n}\n' % (theme_id, body)
+
+
+@lru_cache(maxsize=None)
+def _all_css():
+    """{id: CSS} для всех тем — считается один раз на процесс; кэш не растёт от произвольных id из URL."""
+    return {tid: _build_css(tid) for tid in theme_ids()}
+
+
+def theme_css(theme_id):
+    """CSS одной темы. None — такой темы нет."""
+    return _all_css().get(theme_id)
+
+
+@lru_cache(maxsize=None)
+def themes_version():
+    """Хеш всех тем: входит в URL, поэтому CSS темы можно кэшировать как immutable."""
+    h = hashlib.sha256()
+    for tid in theme_ids():
+        h.update(theme_css(tid).encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+def all_themes_css():
+    """Все темы, кроме темы по умолчанию, одним файлом (для экспорта скриптом generate_themes.py)."""
+    return '\n'.join(theme_css(tid) for tid in theme_ids() if tid != DEFAULT_THEME)
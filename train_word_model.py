@@ -1,38 +1,122 @@
 # -*- coding: utf-8 -*-
 """
 Обучение локальной модели генерации слов.
-Запуск: python train_word_model.py
-Модель обучается на встроенном списке слов и сохраняется в instance/word_gen_model.pkl.
-Можно передать файл со словами (одно слово на строку):
-  python train_word_model.py words.txt
+Запуск: python train_word_model.py [--lang ru|en]
+Без файла модель обучается на встроенном списке слов языка и сохраняется в instance/
+(word_gen_model.pkl для ru, word_gen_model_en.pkl для en).
+
+Большой корпус читается потоково, по строке; в памяти — только счётчики n-грамм
+(для триграмм их размер ограничен алфавитом, а не объёмом файла):
+  python train_word_model.py words.txt --lang en
+  python train_word_model.py freq.txt --weighting log --jobs 8
+
+Строка файла — «слово», «слово частота» или «частота слово» (пробел или таб).
+--weighting: raw — частота как есть, log — 1 + ln(частота), none — каждая строка весит 1.
+--jobs N делит файл на N байтовых шардов по границам строк, считает их в отдельных
+процессах и сливает счётчики. В конце печатаются скорость и пиковая память.
+
+--order N (2–6) обучает модель переменного порядка с откатом Kneser-Ney и сохраняет её
+плоским trie в instance/word_gen_model[_en].trie; приложение загружает его через mmap
+вместо триграммного .pkl. Удалите .trie, чтобы вернуться к триграммной модели.
 """
+import argparse
+import os
 import sys
-from word_model import train, save_model, get_model_path
-from word_generator import REAL_WORDS
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from word_model import (
+    MAX_ORDER, MIN_ORDER, WEIGHTINGS, count_ngrams, count_ngrams_file, get_model_path,
+    get_trie_path, merge_counts, probs_from_counts, save_model, save_trie, shard_offsets,
+)
+from word_generator import REAL_WORDS, REAL_WORDS_EN
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _count_shard(args):
+    path, start, end, weighting, order = args
+    return count_ngrams_file(path, start, end, weighting, order)
+
+
+def _peak_memory_mb():
+    """Пиковый RSS (МБ) этого процесса и самого тяжёлого из завершённых воркеров."""
+    if resource is None:
+        return None, None
+    # ru_maxrss в Linux — килобайты, в macOS — байты
+    scale = 1024.0 * 1024 if sys.platform == 'darwin' else 1024.0
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    return own, children
+
+
+def count_corpus(path, jobs, weighting, order=3):
+    """Счётчики n-грамм файла: в этом процессе при jobs=1, иначе шардами в пуле процессов."""
+    shards = shard_offsets(path, jobs)
+    if len(shards) == 1:
+        return count_ngrams_file(path, weighting=weighting, order=order)
+    counts = {}
+    lines = words = 0
+    total_weight = 0
+    with ProcessPoolExecutor(max_workers=len(shards)) as pool:
+        tasks = [(path, start, end, weighting, order) for start, end in shards]
+        for shard_counts, shard_lines, shard_words, shard_weight in pool.map(_count_shard, tasks):
+            merge_counts(counts, shard_counts)
+            lines += shard_lines
+            words += shard_words
+            total_weight += shard_weight
+    return counts, lines, words, total_weight
 
 
 def main():
-    if len(sys.argv) > 1:
-        path = sys.argv[1]
-        words = []
-        with open(path, 'r', encoding='utf-8') as f:
-            for line in f:
-                w = line.strip().lower()
-                if w and w.isalpha():
-                    words.append(w)
-        print(f'Загружено {len(words)} слов из {path}')
-    else:
-        words = list(REAL_WORDS)
-        print(f'Используется встроенный список: {len(words)} слов')
+    parser = argparse.ArgumentParser(description='Обучение модели генерации слов')
+    parser.add_argument('corpus', nargs='?', help='файл со словами (по умолчанию — встроенный список языка)')
+    parser.add_argument('--lang', choices=('ru', 'en'), default='ru', help='язык модели (по умолчанию ru)')
+    parser.add_argument('--weighting', choices=WEIGHTINGS, default='raw',
+                        help='как учитывать частоту в строке (по умолчанию raw)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1,
+                        help='процессов для подсчёта шардов (по умолчанию — число ядер)')
+    parser.add_argument('--order', type=int, choices=range(MIN_ORDER, MAX_ORDER + 1), metavar='N',
+                        help='порядок модели переменного порядка с откатом Kneser-Ney (%d–%d); '
+                             'без него — триграммная модель .pkl' % (MIN_ORDER, MAX_ORDER))
+    parser.add_argument('--out', help='куда сохранить модель (по умолчанию instance/ для языка)')
+    args = parser.parse_args()
 
-    if not words:
-        print('Нет слов для обучения.')
-        return 1
+    t0 = time.perf_counter()
+    order = args.order or 3
+    if args.corpus:
+        size = os.path.getsize(args.corpus)
+        counts, lines, words, total_weight = count_corpus(args.corpus, max(1, args.jobs), args.weighting, order)
+        elapsed = time.perf_counter() - t0
+        print(f'Прочитано {lines} строк ({size / 1048576:.1f} МБ) из {args.corpus}: '
+              f'{words} слов, суммарный вес {total_weight:.0f}, {len(counts)} {order}-грамм')
+        if not words:
+            print('Нет слов для обучения.')
+            return 1
+        print(f'Подсчёт: {elapsed:.2f} с, {lines / max(elapsed, 1e-9):.0f} строк/с, '
+              f'{size / 1048576 / max(elapsed, 1e-9):.1f} МБ/с')
+    else:
+        builtin = REAL_WORDS_EN if args.lang == 'en' else REAL_WORDS
+        print(f'Используется встроенный список: {len(builtin)} слов')
+        counts = count_ngrams(builtin, order)
 
-    probs = train(words)
-    out = get_model_path()
-    save_model(probs, out)
-    print(f'Модель сохранена: {out}')
+    if args.order:
+        out = args.out or get_trie_path(args.lang)
+        header = save_trie(counts, args.order, out)
+        print(f'Модель порядка {args.order} сохранена: {out} ({header["nodes"]} контекстов, '
+              f'{header["edges"]} рёбер, {os.path.getsize(out) / 1024:.0f} КБ, '
+              f'{time.perf_counter() - t0:.2f} с всего)')
+    else:
+        probs = probs_from_counts(counts)
+        out = args.out or get_model_path(args.lang)
+        save_model(probs, out)
+        print(f'Модель сохранена: {out} ({len(probs)} контекстов, {time.perf_counter() - t0:.2f} с всего)')
+    own, children = _peak_memory_mb()
+    if own is not None:
+        print(f'Пиковая память: {own:.1f} МБ в основном процессе, {children:.1f} МБ в воркерах')
     return 0
 
 
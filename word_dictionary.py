@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""
+Большие частотные словари для генератора «words»: 50–500 тыс. слов на язык.
+
+Словарь собирается из текстового списка в бинарный файл instance/words_<lang>.dict:
+слова упорядочены по частоте (самые частые — первыми), рядом лежат alias-таблицы
+(метод Уокера/Воуза) для всего словаря и для уровней «top N самых частых».
+Файл открывается через mmap только на чтение: страницы общие для всех воркеров
+gunicorn, процесс ничего не копирует в свою память. Выбор слова — O(1): одно
+random(), одно сравнение и чтение двух чисел из таблицы. Там же лежит обратный индекс
+«буква -> id слов» для режима practice: id по возрастанию, то есть от частых к редким.
+
+Сборка:
+  python word_dictionary.py freq_ru.txt --lang ru
+  python word_dictionary.py ranks_en.txt --lang en --numbers rank --limit 200000
+Строка списка — «слово», «слово число» или «число слово». Число — частота (--numbers freq)
+или ранг (--numbers rank, вес 1/ранг по закону Ципфа). Без чисел ранг — номер строки.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from word_model import map_arrays, parse_corpus_line, write_arrays
+
+MAGIC = b'TTDICT\x00\x01'
+# Уровни сложности: выбор только из N самых частых слов. Таблица для уровня
+# строится, если в словаре больше N слов; весь словарь — отдельная таблица.
+TIERS = (100, 500, 1000, 5000, 10000, 50000)
+# Сколько раз перевыбирать слово, совпавшее с предыдущим
+REPEAT_RETRIES = 3
+
+
+def tier_for(top):
+    """Уровень из TIERS, которым обслуживается top: наименьший не меньше top; None — весь словарь."""
+    if top:
+        for tier in TIERS:
+            if tier >= top:
+                return tier
+    return None
+
+
+def get_dictionary_path(lang='ru'):
+    """Путь к файлу словаря lang. TIPTYP_DATA — каталог данных (Docker), как у модели слов."""
+    base = os.environ.get('TIPTYP_DATA') or os.path.dirname(os.path.abspath(__file__))
+    instance = os.path.join(base, 'instance')
+    if not os.path.isdir(instance):
+        instance = base
+    return os.path.join(instance, 'words_%s.dict' % lang)
+
+
+def alias_table(weights):
+    """
+    Alias-таблица Воуза для весов: (prob, alias). Слово i выбирается так:
+    u = random() * n; i = int(u); если u - i < prob[i] — i, иначе alias[i].
+    """
+    n = len(weights)
+    total = float(sum(weights))
+    prob = array('d', [w * n / total for w in weights])
+    alias = array('I', range(n))
+    small = [i for i in range(n) if prob[i] < 1.0]
+    large = [i for i in range(n) if prob[i] >= 1.0]
+    while small and large:
+        s = small.pop()
+        g = large[-1]
+        alias[s] = g
+        prob[g] -= 1.0 - prob[s]
+        if prob[g] < 1.0:
+            small.append(large.pop())
+    # Остатки из-за погрешности округления — «полные» ячейки
+    for i in small + large:
+        prob[i] = 1.0
+    return prob, alias
+
+
+def read_word_list(path, numbers='freq', limit=None):
+    """
+    Текстовый список -> [(слово, вес)] по убыванию веса. Повторы слова складываются.
+    Строки без числа получают ранг по порядку строк.
+    """
+    weights = {}
+    line_no = 0
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            word, number = parse_corpus_line(line, 'raw')
+            if word is None:
+                continue
+            line_no += 1
+            if len(line.split()) == 1:
+                weight = 1.0 / line_no
+            elif numbers == 'rank':
+                weight = 1.0 / number
+            else:
+                weight = number
+            weights[word] = weights.get(word, 0) + weight
+    items = sorted(weights.items(), key=lambda kv: (-kv[1], kv[0]))
+    return items[:limit] if limit else items
+
+
+def _letter_index(words):
+    """
+    Обратный индекс: (кодовые точки букв по возрастанию, начала списков, id слов подряд).
+    Слова с буквой c — postings[postings_first[k]:postings_first[k + 1]] для letters[k] == ord(c).
+    """
+    by_letter = {}
+    for i, word in enumerate(words):
+        for c in set(word):
+            by_letter.setdefault(ord(c), array('I')).append(i)
+    letters = array('I', sorted(by_letter))
+    postings_first = array('I', [0])
+    postings = array('I')
+    for code in letters:
+        postings.extend(by_letter[code])
+        postings_first.append(len(postings))
+    return letters, postings_first, postings
+
+
+def build_dictionary_file(items, path, lang, source=None):
+    """
+    Пишет словарь [(слово, вес)] (уже по убыванию веса) в path атомарно (write_arrays):
+    смещения слов (uint32), UTF-8 слов подряд, обратный индекс по буквам и пары
+    prob (double) / alias (uint32) для каждого уровня.
+    """
+    words = [w.encode('utf-8') for w, _ in items]
+    weights = [wt for _, wt in items]
+    offsets = array('I', [0])
+    for w in words:
+        offsets.append(offsets[-1] + len(w))
+    sizes = [t for t in TIERS if t < len(words)] + [len(words)]
+    letters, postings_first, postings = _letter_index(w for w, _ in items)
+    arrays = [('offsets', offsets), ('words', array('B', b''.join(words))),
+              ('letters', letters), ('postings_first', postings_first), ('postings', postings)]
+    for size in sizes:
+        prob, alias = alias_table(weights[:size])
+        arrays.append(('prob_%d' % size, prob))
+        arrays.append(('alias_%d' % size, alias))
+    header = {'lang': lang, 'count': len(words), 'tiers': sizes,
+              'source': source, 'built': time.strftime('%Y-%m-%dT%H:%M:%S')}
+    return write_arrays(path, MAGIC, header, arrays)
+
+
+class WordDictionary(object):
+    """Словарь из файла через mmap. sample(count, rng, top) — слова с вероятностью по частоте."""
+
+    def __init__(self, path):
+        header, arrays, self._mm = map_arrays(path, MAGIC)
+        self.path = path
+        self.lang = header['lang']
+        self.count = header['count']
+        self.built = header.get('built')
+        self.tiers = header['tiers']
+        self._offsets = arrays['offsets']
+        self._words_at = header['arrays']['words'][0]
+        self._tiers = [(size, arrays['prob_%d' % size], arrays['alias_%d' % size]) for size in self.tiers]
+        self._letters = arrays.get('letters')
+        self._postings_first = arrays.get('postings_first')
+        self._postings = arrays.get('postings')
+
+    def word(self, i):
+        base = self._words_at
+        return self._mm[base + self._offsets[i]:base + self._offsets[i + 1]].decode('utf-8')
+
+    def letter_words(self, letter, top=None):
+        """
+        id слов с буквой letter среди top самых частых (memoryview, без копирования);
+        пусто, если буквы нет или словарь собран без индекса.
+        """
+        if self._letters is None:
+            return ()
+        code = ord(letter)
+        k = bisect_left(self._letters, code)
+        if k >= len(self._letters) or self._letters[k] != code:
+            return ()
+        lo, hi = self._postings_first[k], self._postings_first[k + 1]
+        if top:
+            hi = bisect_left(self._postings, top, lo, hi)
+        return self._postings[lo:hi]
+
+    def _tier(self, top):
+        """Наименьший уровень, в который помещаются top самых частых слов; None — весь словарь."""
+        if top:
+            for tier in self._tiers:
+                if tier[0] >= top:
+                    return tier
+        return self._tiers[-1]
+
+    def sample(self, count, rng, top=None):
+        """count слов по частоте; одно и то же слово подряд перевыбирается (до REPEAT_RETRIES раз)."""
+        n, prob, alias = self._tier(top)
+        random_ = rng.random
+        mm, offsets, base = self._mm, self._offsets, self._words_at
+        out = []
+        prev = -1
+        for _ in range(count):
+            for _ in range(REPEAT_RETRIES + 1):
+                u = random_() * n
+                i = int(u)
+                if u - i >= prob[i]:
+                    i = alias[i]
+                if i != prev:
+                    break
+            prev = i
+            out.append(mm[base + offsets[i]:base + offsets[i + 1]].decode('utf-8'))
+        return out
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class DictionaryRegistry(object):
+    """
+    Словари процесса по языкам. Раз в check_interval секунд сверяется mtime файла:
+    после пересборки словарь переоткрывается, старый mmap закрывается сборщиком мусора,
+    когда его перестают использовать. Нет файла — get() возвращает None.
+    """
+
+    def __init__(self, check_interval=5.0):
+        self.check_interval = check_interval
+        self._entries = {}  # lang -> (stamp, dictionary, checked_at)
+        self._lock = threading.Lock()
+
+    def get(self, lang='ru'):
+        entry = self._entries.get(lang)
+        now = time.monotonic()
+        if entry is not None and now - entry[2] < self.check_interval:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(lang)
+            if entry is not None and now - entry[2] < self.check_interval:
+                return entry[1]
+            path = get_dictionary_path(lang)
+            stamp = _file_stamp(path)
+            if entry is not None and entry[0] == stamp:
+                self._entries[lang] = (stamp, entry[1], now)
+                return entry[1]
+            dictionary = None
+            if stamp is not None:
+                try:
+                    dictionary = WordDictionary(path)
+                except (OSError, ValueError, KeyError):
+                    # Битый файл: оставляем прежний словарь, если был
+                    dictionary = entry[1] if entry is not None else None
+            self._entries[lang] = (stamp, dictionary, now)
+            return dictionary
+
+    def version(self, lang='ru'):
+        """(mtime_ns, size) файла словаря или None — для ETag воспроизводимых выдач."""
+        entry = self._entries.get(lang)
+        return entry[0] if entry is not None and entry[1] is not None else None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+dictionary_registry = DictionaryRegistry()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Сборка частотного словаря для генератора «words»')
+    parser.add_argument('source', help='текстовый список: «слово», «слово число» или «число слово»')
+    parser.add_argument('--lang', choices=('ru', 'en'), default='ru', help='язык словаря (по умолчанию ru)')
+    parser.add_argument('--numbers', choices=('freq', 'rank'), default='freq',
+                        help='что означает число в строке: частота или ранг (по умолчанию freq)')
+    parser.add_argument('--limit', type=int, help='оставить только столько самых частых слов')
+    parser.add_argument('--out', help='куда записать (по умолчанию instance/words_<lang>.dict)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    items = read_word_list(args.source, args.numbers, args.limit)
+    if not items:
+        print('Нет слов в списке.')
+        return 1
+    out = args.out or get_dictionary_path(args.lang)
+    header = build_dictionary_file(items, out, args.lang, os.path.basename(args.source))
+    size = os.path.getsize(out)
+    print(f'Словарь сохранён: {out} ({header["count"]} слов, {size / 1048576:.1f} МБ, '
+          f'уровни {header["tiers"]}, {time.perf_counter() - t0:.1f} с)')
+    print('Самые частые: ' + ', '.join(w for w, _ in items[:10]))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
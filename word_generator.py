@@ -1,21 +1,46 @@
 # -*- coding: utf-8 -*-
 """
 Генерация слов для теста набора.
-- words: осмысленные русские слова из словаря (по умолчанию).
+- words: осмысленные русские слова из словаря (по умолчанию); если собран частотный
+  словарь (word_dictionary.py), слова выбираются из него с учётом частоты.
 - model: наша локальная модель (n-граммы), обучается на словах и сама генерирует новые.
 - syllable: псевдослова из русских слогов.
+- practice: работа над ошибками — слова с буквами, в которых пользователь чаще ошибается.
 """
 import os
+import time
+import hashlib
 import random
+import logging
+import threading
+from array import array
+from bisect import bisect_right
+from collections import deque
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from metrics import registry as metrics_registry
+from word_dictionary import REPEAT_RETRIES, dictionary_registry
 from word_model import (
     train as model_train,
-    load_model,
     save_model,
     generate_words_from_model,
+    expected_unique_words,
     get_model_path,
+    model_registry,
+    ATTEMPTS_PER_WORD,
 )
 
+log = logging.getLogger(__name__)
+
+# Версия алгоритмов выборки: входит в ETag воспроизводимых (seed) выдач /api/words.
+# Увеличивать при любом изменении, после которого тот же seed даёт другие слова.
+# 2 — слоги выбираются пачкой через rng.choices; 3 — свой rng у каждой порции (seeded_chunk).
+SEEDED_VERSION = 3
+
 
 # Осмысленные русские слова для режима "слова" 
 REAL_WORDS = [
@@ -28,31 +53,31 @@ REAL_WORDS = [
     'луна', 'город', 'улица', 'дорога', 'путь', 'час', 'минута', 'неделя', 'месяц', 'вечер',
     'утро', 'зима', 'весна', 'лето', 'осень', 'холод', 'тепло', 'свет', 'тень', 'звук',
     'голос', 'музыка', 'книга', 'страница', 'письмо', 'язык', 'речь', 'мысль', 'душа', 'сердце',
-    'сила', 'власть', 'право', 'закон', 'порядок', 'война', 'мир', 'правда', 'ложь', 'добро',
-    'зло', 'любовь', 'дружба', 'работа', 'труд', 'дело', 'цель', 'смысл', 'ответ', 'вопрос',
-    'начало', 'конец', 'результат', 'способ', 'средство', 'условие', 'возможность', 'шанс',
+    'сила', 'власть', 'право', 'закон', 'порядок', 'война', 'правда', 'ложь', 'добро',
+    'зло', 'любовь', 'дружба', 'работа', 'труд', 'цель', 'смысл', 'ответ',
+    'начало', 'результат', 'способ', 'средство', 'условие', 'возможность', 'шанс',
     'причина', 'следствие', 'вывод', 'решение', 'выбор', 'мнение', 'знание', 'опыт', 'ум',
     'память', 'внимание', 'желание', 'надежда', 'страх', 'радость', 'грусть', 'счастье',
     'отец', 'мать', 'сын', 'дочь', 'брат', 'сестра', 'муж', 'жена', 'ребёнок', 'семья',
-    'друг', 'враг', 'гость', 'хозяин', 'учитель', 'ученик', 'врач', 'больной', 'писатель',
+    'враг', 'гость', 'хозяин', 'учитель', 'ученик', 'врач', 'больной', 'писатель',
     'читатель', 'художник', 'музыкант', 'учёный', 'инженер', 'рабочий', 'крестьянин',
-    'поле', 'лес', 'река', 'море', 'гора', 'долина', 'остров', 'берег', 'небо', 'звезда',
+    'поле', 'лес', 'река', 'море', 'гора', 'долина', 'остров', 'берег', 'звезда',
     'птица', 'зверь', 'рыба', 'дерево', 'цветок', 'трава', 'камень', 'песок', 'металл',
-    'хлеб', 'вода', 'молоко', 'мясо', 'фрукт', 'овощ', 'чай', 'кофе', 'сахар', 'соль',
+    'хлеб', 'молоко', 'мясо', 'фрукт', 'овощ', 'чай', 'кофе', 'сахар', 'соль',
     'стол', 'стул', 'кровать', 'окно', 'комната', 'кухня', 'ванна', 'двор', 'сад',
     'школа', 'университет', 'больница', 'магазин', 'банк', 'офис', 'завод', 'фабрика',
     'идти', 'бежать', 'сидеть', 'стоять', 'лежать', 'спать', 'есть', 'пить', 'читать',
-    'писать', 'думать', 'знать', 'видеть', 'слышать', 'говорить', 'понимать', 'помнить',
-    'хотеть', 'мочь', 'должен', 'нужно', 'можно', 'нельзя', 'надо', 'пора', 'пора',
+    'писать', 'думать', 'знать', 'видеть', 'слышать', 'понимать', 'помнить',
+    'хотеть', 'мочь', 'должен', 'нужно', 'нельзя', 'надо', 'пора',
     'здесь', 'там', 'тут', 'везде', 'нигде', 'иногда', 'всегда', 'часто', 'редко', 'скоро',
-    'потом', 'сначала', 'теперь', 'уже', 'ещё', 'только', 'даже', 'лишь', 'просто', 'точно',
-    'почти', 'совсем', 'полностью', 'частично', 'много', 'мало', 'несколько', 'больше', 'меньше',
-    'хороший', 'плохой', 'новый', 'старый', 'большой', 'маленький', 'длинный', 'короткий',
+    'потом', 'сначала', 'теперь', 'уже', 'только', 'даже', 'лишь', 'просто', 'точно',
+    'почти', 'совсем', 'полностью', 'частично', 'мало', 'несколько', 'больше', 'меньше',
+    'хороший', 'плохой', 'старый', 'большой', 'маленький', 'длинный', 'короткий',
     'высокий', 'низкий', 'широкий', 'узкий', 'толстый', 'тонкий', 'тяжёлый', 'лёгкий',
     'быстрый', 'медленный', 'горячий', 'холодный', 'тёплый', 'светлый', 'тёмный', 'яркий',
     'тихий', 'громкий', 'мягкий', 'твёрдый', 'острый', 'тупой', 'гладкий', 'шершавый',
     'красивый', 'уродливый', 'умный', 'глупый', 'добрый', 'злой', 'честный', 'лживый',
-    'богатый', 'бедный', 'сильный', 'слабый', 'здоровый', 'больной', 'молодой', 'старый',
+    'богатый', 'бедный', 'сильный', 'слабый', 'здоровый', 'молодой',
     'живой', 'мёртвый', 'свободный', 'занятой', 'готовый', 'пустой', 'полный', 'открытый',
     'закрытый', 'правый', 'левый', 'верхний', 'нижний', 'внешний', 'внутренний', 'передний',
     'задний', 'последний', 'следующий', 'текущий', 'прошлый', 'будущий', 'настоящий',
@@ -70,10 +95,10 @@ REAL_WORDS_EN = [
     'any', 'these', 'give', 'day', 'most', 'us', 'is', 'was', 'are', 'were', 'been', 'has', 'had', 'did',
     'word', 'world', 'right', 'find', 'long', 'down', 'own', 'part', 'place', 'same', 'number', 'live',
     'where', 'before', 'mean', 'old', 'high', 'such', 'follow', 'change', 'light', 'kind', 'need', 'house',
-    'picture', 'try', 'again', 'line', 'different', 'turn', 'cause', 'same', 'show', 'every', 'small',
-    'three', 'set', 'put', 'end', 'does', 'another', 'well', 'large', 'must', 'big', 'through', 'here',
-    'while', 'where', 'much', 'before', 'right', 'means', 'still', 'last', 'never', 'left', 'call',
-    'each', 'thing', 'may', 'many', 'after', 'water', 'life', 'hand', 'sound', 'point', 'letter', 'form',
+    'picture', 'try', 'again', 'line', 'different', 'turn', 'cause', 'show', 'every', 'small',
+    'three', 'set', 'put', 'end', 'does', 'another', 'large', 'must', 'big', 'through', 'here',
+    'while', 'much', 'means', 'still', 'last', 'never', 'left', 'call',
+    'each', 'thing', 'may', 'many', 'water', 'life', 'hand', 'sound', 'point', 'letter', 'form',
 ]
 
 # Russian syllables for procedural generation
@@ -98,51 +123,403 @@ SYLLABLES_EN = [
 ]
 
 
-def generate_real_words(count=45, lang='ru'):
-    """Осмысленные слова (ru или en)."""
+def generate_real_words(count=45, lang='ru', rng=random, top=None):
+    """
+    Осмысленные слова (ru или en). rng — модуль random или свой random.Random.
+    Если в TIPTYP_DATA есть частотный словарь языка — слова из него по частоте,
+    top — только из top самых частых. Иначе встроенный список (top не учитывается).
+    """
+    dictionary = dictionary_registry.get(lang)
+    if dictionary is not None:
+        return dictionary.sample(count, rng, top)
     word_list = REAL_WORDS_EN if lang == 'en' else REAL_WORDS
-    count = min(count, len(word_list)) if count <= len(word_list) else count
     if count <= len(word_list):
-        return random.sample(word_list, count)
-    return random.choices(word_list, k=count)
+        return rng.sample(word_list, count)
+    return rng.choices(word_list, k=count)
+
+
+_builtin_versions = {}
+
+
+def words_version(lang='ru'):
+    """Версия файла частотного словаря lang, а без него — хеш встроенного списка слов."""
+    dictionary_registry.get(lang)
+    version = dictionary_registry.version(lang)
+    if version is not None:
+        return version
+    version = _builtin_versions.get(lang)
+    if version is None:
+        word_list = REAL_WORDS_EN if lang == 'en' else REAL_WORDS
+        digest = hashlib.sha1('\n'.join(word_list).encode('utf-8')).hexdigest()[:12]
+        version = _builtin_versions[lang] = 'builtin-' + digest
+    return version
+
+
+# Режим practice: сколько самых слабых букв учитывать, доля обычных слов в выдаче
+# и из скольких самых частых слов словаря брать слова с буквой (если top не задан)
+PRACTICE_LETTERS = 8
+PRACTICE_MIX = 0.25
+PRACTICE_TOP = 10000
+
+_builtin_letter_index = {}
+
+
+class _BuiltinLetterIndex(object):
+    """Обратный индекс «буква -> id слов» для встроенного списка; тот же интерфейс, что у WordDictionary."""
+
+    def __init__(self, word_list):
+        self._words = word_list
+        postings = {}
+        for i, w in enumerate(word_list):
+            for c in set(w):
+                postings.setdefault(c, []).append(i)
+        self._postings = {c: tuple(ids) for c, ids in postings.items()}
+
+    def word(self, i):
+        return self._words[i]
+
+    def letter_words(self, letter, top=None):
+        return self._postings.get(letter, ())
+
 
+def _letter_index(lang):
+    """Частотный словарь языка, если есть (индекс лежит в файле), иначе индекс встроенного списка."""
+    dictionary = dictionary_registry.get(lang)
+    if dictionary is not None:
+        return dictionary
+    index = _builtin_letter_index.get(lang)
+    if index is None:
+        index = _builtin_letter_index[lang] = _BuiltinLetterIndex(REAL_WORDS_EN if lang == 'en' else REAL_WORDS)
+    return index
 
-def generate_via_model(count=45, train_words=None, lang='ru'):
-    """Генерация слов локальной моделью. lang: 'ru' | 'en'."""
-    path = get_model_path(lang)
-    probs = load_model(path)
-    if probs is None:
+
+def generate_practice_words(count=45, lang='ru', letters=None, rng=random, top=None):
+    """
+    Слова для работы над ошибками. letters — {буква: ошибок}; берутся PRACTICE_LETTERS
+    самых слабых. Для каждого слова буква выбирается пропорционально числу ошибок,
+    слово — равновероятно из списка слов с этой буквой (обратный индекс, среди top
+    самых частых). Примерно PRACTICE_MIX слов — обычные, чтобы текст не был однообразным.
+    Нет букв или слов с ними — обычные слова.
+    """
+    index = _letter_index(lang)
+    weak = sorted((letters or {}).items(), key=lambda kv: (-kv[1], kv[0]))[:PRACTICE_LETTERS]
+    postings, cum = [], []
+    total = 0
+    for letter, errors in weak:
+        ids = index.letter_words(letter, top or PRACTICE_TOP)
+        if len(ids) and errors > 0:
+            total += errors
+            postings.append(ids)
+            cum.append(total)
+    if not postings:
+        return generate_real_words(count, lang, rng, top)
+    random_ = rng.random
+    plain = [random_() < PRACTICE_MIX for _ in range(count)]
+    mixed = iter(generate_real_words(sum(plain), lang, rng, top))
+    out = []
+    prev = None
+    for is_plain in plain:
+        if is_plain:
+            w = next(mixed)
+        else:
+            for _ in range(REPEAT_RETRIES + 1):
+                ids = postings[bisect_right(cum, random_() * total)]
+                w = index.word(ids[int(random_() * len(ids))])
+                if w != prev:
+                    break
+        prev = w
+        out.append(w)
+    return out
+
+
+def _get_model(lang='ru', train_words=None):
+    """Модель из model_registry; если файла нет — обучает, сохраняет и регистрирует."""
+    model = model_registry.get(lang)
+    if model is None:
         words_for_train = train_words or (REAL_WORDS_EN if lang == 'en' else REAL_WORDS)
         probs = model_train(words_for_train)
+        path = get_model_path(lang)
         save_model(probs, path)
-    result = generate_words_from_model(probs, count)
+        model = model_registry.put(lang, probs, path)
+    return model
+
+
+def generate_via_model(count=45, train_words=None, lang='ru', rng=random):
+    """Генерация слов локальной моделью. lang: 'ru' | 'en'. Модель берётся из model_registry."""
+    result = generate_words_from_model(_get_model(lang, train_words), count, rng)
     if len(result) < count:
-        result.extend(generate_real_words(count - len(result), lang))
+        result.extend(generate_real_words(count - len(result), lang, rng))
     return result[:count]
 
 
-def generate_syllable_words(count=45, min_syllables=2, max_syllables=4, lang='ru'):
-    """Псевдослова из слогов (ru или en)."""
+def model_version(lang='ru'):
+    """Версия файла модели lang (меняется после переобучения); при необходимости загружает модель."""
+    _get_model(lang)
+    return model_registry.version(lang)
+
+
+def expected_model_words(count=45, lang='ru'):
+    """Сколько различных слов модель lang в среднем выдаст за попытки на count слов."""
+    return expected_unique_words(_get_model(lang), count * ATTEMPTS_PER_WORD)
+
+
+def model_will_pad(count=45, lang='ru'):
+    """True, если модели заведомо не хватит уникальных слов и ответ будет добит словарём."""
+    return expected_model_words(count, lang) < count
+
+
+def generate_syllable_words(count=45, min_syllables=2, max_syllables=4, lang='ru', rng=random):
+    """
+    Псевдослова из слогов (ru или en): число слогов равномерно в [min_syllables, max_syllables],
+    слоги равновероятны. Все случайные числа берутся пачкой, слова склеиваются за один проход.
+    Без своего rng, с установленным NumPy и count >= NUMPY_MIN_COUNT — векторно через NumPy;
+    со своим rng (seed) — всегда через rng, чтобы выдача по seed не зависела от того, установлен ли NumPy.
+    """
     syll = SYLLABLES_EN if lang == 'en' else SYLLABLES
+    if numpy is not None and rng is random and count >= NUMPY_MIN_COUNT:
+        return _syllable_words_numpy(count, lang, syll, min_syllables, max_syllables)
+    return _syllable_words_batched(count, syll, min_syllables, max_syllables, rng)
+
+
+def _syllable_words_batched(count, syll, min_syllables, max_syllables, rng):
+    """Без NumPy: две пачки rng.choices (длины слов и слоги) вместо randint и choices на каждое слово."""
+    lengths = array('B', rng.choices(range(min_syllables, max_syllables + 1), k=count))
+    picked = rng.choices(syll, k=sum(lengths))
     words = []
-    for _ in range(count):
-        n = random.randint(min_syllables, max_syllables)
-        words.append(''.join(random.choices(syll, k=n)))
+    start = 0
+    for n in lengths:
+        end = start + n
+        words.append(''.join(picked[start:end]))
+        start = end
+    return words
+
+
+# С какого count NumPy быстрее пачек rng.choices (у вызова NumPy заметная постоянная цена)
+NUMPY_MIN_COUNT = 100
+# Слоги языка + пробел-разделитель как массив NumPy: выбор слогов — одна индексация
+_numpy_syllables = {}
+# Генератор NumPy на поток (он не потокобезопасен); после fork пересоздаётся,
+# иначе воркеры gunicorn выдавали бы одинаковые последовательности
+_numpy_local = threading.local()
+
+
+def _numpy_generator():
+    gen = getattr(_numpy_local, 'gen', None)
+    if gen is None or _numpy_local.pid != os.getpid():
+        gen = _numpy_local.gen = numpy.random.default_rng()
+        _numpy_local.pid = os.getpid()
+    return gen
+
+
+def _syllable_words_numpy(count, lang, syll, min_syllables, max_syllables):
+    """
+    NumPy: длины и индексы слогов — два вызова integers; на место после каждого слова ставится
+    индекс пробела, и весь поток склеивается одним join и режется split.
+    """
+    table = _numpy_syllables.get(lang)
+    if table is None:
+        table = _numpy_syllables[lang] = numpy.array(list(syll) + [' '], dtype=object)
+    gen = _numpy_generator()
+    lengths = gen.integers(min_syllables, max_syllables + 1, size=count)
+    ends = numpy.cumsum(lengths + 1) - 1
+    idx = gen.integers(0, len(syll), size=int(ends[-1]) + 1)
+    idx[ends] = len(syll)
+    return ''.join(table[idx].tolist()).split(' ')[:count]
+
+
+class WordPool(object):
+    """
+    Запас заранее сгенерированных уникальных слов для одного (генератор, язык).
+    take() отдаёт первые count слов за O(count); когда в пуле остаётся меньше
+    low_water слов, фоновый поток догенерирует его до capacity.
+    Если слов не хватает, take() возвращает None — вызывающий генерирует сам.
+    """
+
+    def __init__(self, fill, capacity=2000, low_water=500):
+        self.capacity = capacity
+        self.low_water = low_water
+        self._fill = fill
+        self._words = deque()
+        self._members = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+        self.refills = 0
+
+    def _ensure_worker(self):
+        # После fork (gunicorn) потока в дочернем процессе нет — запускаем заново
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='word-pool', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                self.refill()
+            except Exception:
+                log.exception('word pool refill failed')
+
+    def refill(self):
+        """Догенерировать пул до capacity (вызывается фоновым потоком)."""
+        with self._lock:
+            need = self.capacity - len(self._words)
+        if need <= 0:
+            return
+        fresh = self._fill(need)
+        with self._lock:
+            for w in fresh:
+                if len(self._words) >= self.capacity:
+                    break
+                if w not in self._members:
+                    self._members.add(w)
+                    self._words.append(w)
+            self.refills += 1
+
+    def take(self, count):
+        """count уникальных слов из пула или None, если их там меньше count."""
+        self._ensure_worker()
+        with self._lock:
+            if count <= len(self._words):
+                popleft = self._words.popleft
+                out = [popleft() for _ in range(count)]
+                self._members.difference_update(out)
+                self.hits += 1
+                low = len(self._words) < self.low_water
+            else:
+                out = None
+                self.misses += 1
+                low = True
+        if low:
+            self._wake.set()
+        return out
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._words),
+                'hits': self.hits,
+                'misses': self.misses,
+                'refills': self.refills,
+                'hit_rate': round(self.hits / total, 3) if total else None,
+            }
+
+
+# Пулы включены по умолчанию; TIPTYP_WORD_POOLS=0 — генерировать всё синхронно
+POOLS_ENABLED = os.environ.get('TIPTYP_WORD_POOLS', '1') != '0'
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _pool_fill(generator, lang):
+    if generator == 'model':
+        return lambda n: generate_words_from_model(_get_model(lang), n)
+    return lambda n: generate_syllable_words(n, lang=lang)
+
+
+def get_pool(generator, lang):
+    """Пул для ('model' | 'syllable', lang); создаётся при первом обращении."""
+    key = (generator, lang)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = WordPool(_pool_fill(generator, lang))
+    return pool
+
+
+def pool_stats():
+    """Статистика пулов: {'model:ru': {'size', 'hits', 'misses', 'refills', 'hit_rate'}, ...}."""
+    return {'%s:%s' % key: pool.stats() for key, pool in list(_pools.items())}
+
+
+_generation_seconds = metrics_registry.histogram(
+    'tiptyp_word_generation_seconds', 'Время generate_words (source: pool — из пула, direct — генерация в запросе)',
+    ('generator', 'lang', 'source'))
+_words_generated = metrics_registry.counter(
+    'tiptyp_words_generated_total', 'Сколько слов выдал generate_words', ('generator', 'lang'))
+
+
+def generate_words(count=45, generator='words', lang='ru', seed=None, rng=None, top=None, letters=None):
+    """
+    Единая точка входа. lang: 'ru' | 'en'. count: 1–10000.
+    seed — одинаковые (seed, generator, lang, count) всегда дают одни и те же слова
+    (свой random.Random на запрос, пулы не используются). rng — уже созданный генератор.
+    top — для words и practice: только top самых частых слов словаря (уровень сложности).
+    letters — для practice: {буква: ошибок}, см. generate_practice_words.
+    """
+    t0 = time.perf_counter()
+    words, generator, source = _generate_words(count, generator, lang, seed, rng, top, letters)
+    _generation_seconds.observe(generator, lang, source, value=time.perf_counter() - t0)
+    _words_generated.inc(generator, lang, amount=len(words))
     return words
 
 
-def generate_words(count=45, generator='words', lang='ru'):
-    """Единая точка входа. lang: 'ru' | 'en'. count: 1–10000."""
+def _generate_words(count, generator, lang, seed, rng, top=None, letters=None):
+    """generate_words без замеров: (слова, фактический генератор, 'pool' | 'direct')."""
     count = max(1, min(10000, int(count)))
+    if rng is None and seed is not None:
+        rng = random.Random(seed)
     if generator == 'words':
-        return generate_real_words(count, lang)
+        return generate_real_words(count, lang, rng or random, top), generator, 'direct'
+    if generator == 'practice':
+        return generate_practice_words(count, lang, letters, rng or random, top), generator, 'direct'
+    if generator not in ('model', 'syllable'):
+        generator = 'syllable'
+    if POOLS_ENABLED and rng is None:
+        pool = get_pool(generator, lang)
+        if count <= pool.capacity:
+            words = pool.take(count)
+            if words is not None:
+                return words, generator, 'pool'
     if generator == 'model':
-        return generate_via_model(count, lang=lang)
-    return generate_syllable_words(count, lang=lang)
+        return generate_via_model(count, lang=lang, rng=rng or random), generator, 'direct'
+    return generate_syllable_words(count, lang=lang, rng=rng or random), generator, 'direct'
+
+
+def iter_words(count=45, generator='words', lang='ru', chunk_size=500, seed=None, top=None, letters=None):
+    """
+    Те же слова, что generate_words, но порциями по chunk_size: в памяти одновременно
+    только одна порция. Уникальность (для model) гарантируется внутри порции.
+    С seed вся последовательность порций воспроизводима (см. seeded_chunk).
+    """
+    count = max(1, min(10000, int(count)))
+    chunk_size = max(1, int(chunk_size))
+    for index in range((count + chunk_size - 1) // chunk_size):
+        if seed is not None:
+            yield seeded_chunk(seed, index, count, generator, lang, chunk_size, top, letters)
+        else:
+            n = min(chunk_size, count - index * chunk_size)
+            yield generate_words(n, generator, lang, top=top, letters=letters)
+
+
+def seeded_chunk(seed, index, count, generator='words', lang='ru', chunk_size=500, top=None, letters=None):
+    """
+    Порция index воспроизводимой выдачи из count слов. У каждой порции свой random.Random
+    из (seed, index), поэтому любую страницу можно получить, не генерируя предыдущие.
+    """
+    count = max(1, min(10000, int(count)))
+    n = min(chunk_size, count - index * chunk_size)
+    if n <= 0:
+        return []
+    rng = random.Random('%s:%d' % (seed, index))
+    return generate_words(n, generator, lang, rng=rng, top=top, letters=letters)
 
 
 def ensure_model_trained():
     """Обучает модели при старте, если файлы ещё не созданы."""
     for lang in ('ru', 'en'):
-        if load_model(get_model_path(lang)) is None:
+        if model_registry.get(lang) is None:
             generate_via_model(1, lang=lang)
@@ -5,8 +5,18 @@
 по обученному распределению. Работает без внешних API и тяжёлых зависимостей.
 """
 import os
+import sys
+import json
+import math
+import mmap
 import random
 import pickle
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from heapq import heappush, heappop
 
 # Специальные токены для границ слова
 START = '\x00'
@@ -16,41 +26,161 @@ END = '\x01'
 MIN_WORD_LEN = 2
 MAX_WORD_LEN = 14
 
+# Сколько сэмплов generate_words_from_model тратит на одно слово (дубликаты отбрасываются)
+ATTEMPTS_PER_WORD = 20
+
 
 def _normalize_word(w):
     """Оставляем только буквы в нижнем регистре (кириллица и латиница)."""
     return ''.join(c for c in w.lower() if c.isalpha())
 
 
+def _add_ngrams(counts, word, weight=1, order=3):
+    """Добавляет n-граммы слова (с границами START/END) в плоский словарь 'c1..cn' -> вес."""
+    seq = START * (order - 1) + word + END
+    for i in range(len(seq) - order + 1):
+        key = seq[i:i + order]
+        counts[key] = counts.get(key, 0) + weight
+
+
+def probs_from_counts(counts, smoothing=0.5):
+    """
+    Плоские счётчики триграмм -> модель (c1, c2) -> { c3: вероятность } с add-smoothing.
+    Порядок ключей совпадает с порядком первого появления — как у train на тех же словах.
+    """
+    grouped = {}
+    for key, cnt in counts.items():
+        grouped.setdefault((key[0], key[1]), {})[key[2]] = cnt
+    probs = {}
+    for key, next_counts in grouped.items():
+        total = sum(next_counts.values()) + smoothing * (len(next_counts) + 1)
+        probs[key] = {
+            c: (cnt + smoothing) / total
+            for c, cnt in next_counts.items()
+        }
+    return probs
+
+
 def train(words, smoothing=0.5):
     """
     Обучает модель на списке слов.
     Строит распределение P(c_next | c_prev, c_prev2) — триграммы по символам.
     Возвращает структуру для генерации: (c1, c2) -> { c3: вероятность }.
     """
-    # (c1, c2) -> { c3: count }
+    return probs_from_counts(count_ngrams(words), smoothing)
+
+
+def count_ngrams(words, order=3):
+    """
+    Счётчики n-грамм списка слов: плоский словарь 'c1..cn' -> count. Для триграмм его размер
+    ограничен алфавитом, а не объёмом корпуса.
+    """
     counts = {}
     for w in words:
         w = _normalize_word(w)
-        if len(w) < 1:
-            continue
-        seq = [START, START] + list(w) + [END]
-        for i in range(len(seq) - 2):
-            c1, c2, c3 = seq[i], seq[i + 1], seq[i + 2]
-            key = (c1, c2)
-            if key not in counts:
-                counts[key] = {}
-            counts[key][c3] = counts[key].get(c3, 0) + 1
+        if w:
+            _add_ngrams(counts, w, 1, order)
+    return counts
+
+
+WEIGHTINGS = ('raw', 'log', 'none')
+
+
+def _is_number(token):
+    """Конечное число: nan, inf и 1e400 весом быть не могут — они испортили бы все вероятности."""
+    try:
+        return math.isfinite(float(token))
+    except ValueError:
+        return False
+
+
+def parse_corpus_line(line, weighting='raw'):
+    """
+    Строка корпуса -> (слово, вес) или (None, 0). Форматы: «слово», «слово<пробел/таб>частота»
+    или «частота слово» (как в частотных словарях). weighting: raw — вес = частота,
+    log — 1 + ln(частота), none — частота игнорируется. Слова не из одних букв пропускаются.
+    """
+    parts = line.split()
+    if not parts:
+        return None, 0
+    weight = 1
+    word = parts[0]
+    if len(parts) >= 2:
+        if _is_number(parts[1]):
+            word, weight = parts[0], float(parts[1])
+        elif _is_number(parts[0]):
+            word, weight = parts[1], float(parts[0])
+        else:
+            return None, 0
+    if isinstance(weight, float) and weight.is_integer():
+        weight = int(weight)
+    word = word.lower()
+    if not word.isalpha() or weight <= 0:
+        return None, 0
+    if weighting == 'none':
+        weight = 1
+    elif weighting == 'log':
+        weight = 1.0 + math.log(weight) if weight > 1 else 1.0
+    return word, weight
+
+
+def shard_offsets(path, shards):
+    """Делит файл на shards байтовых диапазонов [start, end); границы строк выравнивает count_ngrams_file."""
+    size = os.path.getsize(path)
+    shards = max(1, min(shards, size // (1 << 16) + 1))
+    step = size // shards
+    bounds = [i * step for i in range(shards)] + [size]
+    return list(zip(bounds[:-1], bounds[1:]))
 
-    # Сглаживание (add-smoothing) и перевод в вероятности
-    probs = {}
-    for key, next_counts in counts.items():
-        total = sum(next_counts.values()) + smoothing * (len(next_counts) + 1)
-        probs[key] = {
-            c: (cnt + smoothing) / total
-            for c, cnt in next_counts.items()
-        }
-    return probs
+
+# Сколько разных слов копится перед разбором на n-граммы: повторы слова в корпусе
+# складываются одним сложением, а память остаётся ограниченной
+PENDING_WORDS_MAX = 100000
+
+
+def count_ngrams_file(path, start=0, end=None, weighting='raw', order=3):
+    """
+    Считает n-граммы порядка order строк файла, которые начинаются в [start, end), читая по строке.
+    Память — плоский словарь счётчиков и буфер не больше PENDING_WORDS_MAX слов.
+    Возвращает (counts, строк, слов, суммарный вес).
+    """
+    counts = {}
+    pending = {}
+    lines = words = 0
+    total_weight = 0
+    with open(path, 'rb') as f:
+        if start > 0:
+            # Строку, начатую до start, дочитывает предыдущий шард
+            f.seek(start - 1)
+            pos = start - 1 + len(f.readline())
+        else:
+            pos = 0
+        while end is None or pos < end:
+            raw = f.readline()
+            if not raw:
+                break
+            pos += len(raw)
+            lines += 1
+            word, weight = parse_corpus_line(raw.decode('utf-8', errors='ignore'), weighting)
+            if word is None:
+                continue
+            pending[word] = pending.get(word, 0) + weight
+            words += 1
+            total_weight += weight
+            if len(pending) >= PENDING_WORDS_MAX:
+                for w, wt in pending.items():
+                    _add_ngrams(counts, w, wt, order)
+                pending.clear()
+    for w, wt in pending.items():
+        _add_ngrams(counts, w, wt, order)
+    return counts, lines, words, total_weight
+
+
+def merge_counts(target, other):
+    """Слияние счётчиков шардов: target += other."""
+    for key, cnt in other.items():
+        target[key] = target.get(key, 0) + cnt
+    return target
 
 
 def generate_one_word(probs, max_attempts=50):
@@ -79,14 +209,196 @@ def generate_one_word(probs, max_attempts=50):
     return None
 
 
-def generate_words_from_model(probs, count=45):
-    """Генерирует count слов. Повторяет попытки, если слово не подошло или дубликат."""
+class CompiledModel(object):
+    """
+    Скомпилированное представление результата train() для быстрого сэмплирования.
+    Состояния (c1, c2) заменены целыми id; для каждого состояния хранятся
+    символы-продолжения, кумулятивные веса (для bisect) и id следующего состояния
+    (-1 — слово на этом символе заканчивается).
+    cond[s][k] — кумулятивные веса того же состояния при уже набранных k символах,
+    умноженные на вероятность закончить слово в пределах MIN_WORD_LEN..MAX_WORD_LEN
+    (None, если из (s, k) допустимое слово получить нельзя).
+    """
+    __slots__ = ('start', 'chars', 'cum', 'totals', 'next_state', 'cond', '_frontier', '_unique')
+
+    def __init__(self, start, chars, cum, totals, next_state, cond):
+        self.start = start
+        self.chars = chars
+        self.cum = cum
+        self.totals = totals
+        self.next_state = next_state
+        self.cond = cond
+        self._frontier = None
+        self._unique = {}
+
+    def __len__(self):
+        return len(self.chars)
+
+
+def _length_tables(chars, cum, totals, next_state):
+    """
+    Динамика по длине: f[k][s] — вероятность, что из состояния s после k символов
+    слово закончится с длиной в допустимом окне. Сэмплирование по весам p(c) * f(продолжения)
+    даёт ровно условное распределение модели при условии «слово допустимой длины».
+    """
+    n = len(chars)
+    f = [[0.0] * n for _ in range(MAX_WORD_LEN + 2)]
+    cond = [[None] * (MAX_WORD_LEN + 1) for _ in range(n)]
+    for k in range(MAX_WORD_LEN, -1, -1):
+        f_next = f[k + 1]
+        end_ok = 1.0 if k >= MIN_WORD_LEN else 0.0
+        stop_ok = 1.0 if MIN_WORD_LEN <= k + 1 <= MAX_WORD_LEN else 0.0
+        for s in range(n):
+            acc = 0.0
+            prev = 0.0
+            weights = []
+            for c, w, ns in zip(chars[s], cum[s], next_state[s]):
+                p = w - prev
+                prev = w
+                if c == END:
+                    g = end_ok
+                elif k + 1 > MAX_WORD_LEN:
+                    g = 0.0
+                elif ns < 0:
+                    g = stop_ok
+                else:
+                    g = f_next[ns]
+                acc += p * g
+                weights.append(acc)
+            if acc > 0.0:
+                f[k][s] = acc / totals[s]
+                cond[s][k] = tuple(weights)
+    return tuple(tuple(row) for row in cond)
+
+
+def compile_model(probs):
+    """Строит CompiledModel из словаря (c1, c2) -> { c3: вероятность }. Делается один раз на модель."""
+    if isinstance(probs, (CompiledModel, TrieModel)):
+        return probs
+    ids = {key: i for i, key in enumerate(probs)}
+    chars, cum, totals, next_state = [], [], [], []
+    for (_, c2), dist in probs.items():
+        symbols = tuple(dist)
+        acc = 0.0
+        weights = []
+        for c in symbols:
+            acc += dist[c]
+            weights.append(acc)
+        chars.append(symbols)
+        cum.append(tuple(weights))
+        totals.append(acc)
+        next_state.append(tuple(-1 if c == END else ids.get((c2, c), -1) for c in symbols))
+    return CompiledModel(
+        ids.get((START, START), -1),
+        tuple(chars), tuple(cum), tuple(totals), tuple(next_state),
+        _length_tables(chars, cum, totals, next_state),
+    )
+
+
+def _pick(weights, x):
+    """Индекс по кумулятивным весам; x в [0, weights[-1])."""
+    i = bisect_right(weights, x)
+    if i >= len(weights):
+        # x округлился до суммы — берём последний символ с ненулевым весом
+        i = bisect_left(weights, weights[-1])
+    return i
+
+
+def sample_word(model, rnd=random.random):
+    """
+    Одно слово из CompiledModel без отбраковки: один random() и один bisect на символ,
+    сразу из распределения, ограниченного допустимой длиной. None — модель пуста.
+    """
+    s = model.start
+    if s < 0 or model.cond[s][0] is None:
+        return None
+    chars, cond, next_state = model.chars, model.cond, model.next_state
+    word_chars = []
+    k = 0
+    while True:
+        weights = cond[s][k]
+        i = _pick(weights, rnd() * weights[-1])
+        c = chars[s][i]
+        if c == END:
+            break
+        word_chars.append(c)
+        k += 1
+        s = next_state[s][i]
+        if s < 0:
+            break
+    return ''.join(word_chars)
+
+
+def _word_frontier(model, max_nodes=20000):
+    """
+    Раскрывает дерево префиксов в порядке убывания вероятности (не больше max_nodes узлов).
+    Возвращает вероятности законченных слов и нераскрытых префиксов.
+    """
+    s = model.start
+    if s < 0 or model.cond[s][0] is None:
+        return ()
+    chars, cond, next_state = model.chars, model.cond, model.next_state
+    heap = [(-1.0, s, 0)]
+    masses = []
+    expanded = 0
+    while heap and expanded < max_nodes:
+        neg_p, s, k = heappop(heap)
+        expanded += 1
+        weights = cond[s][k]
+        scale = -neg_p / weights[-1]
+        prev = 0.0
+        for c, w, ns in zip(chars[s], weights, next_state[s]):
+            q = (w - prev) * scale
+            prev = w
+            if q <= 0.0:
+                continue
+            if c == END or ns < 0:
+                masses.append(q)
+            else:
+                heappush(heap, (-q, ns, k + 1))
+    masses.extend(-neg_p for neg_p, _, _ in heap)
+    return tuple(masses)
+
+
+def expected_unique_words(probs, draws):
+    """
+    Ожидаемое число различных слов среди draws сэмплов: sum(1 - (1 - p_w) ** draws).
+    Нераскрытые префиксы считаются одним словом, поэтому оценка снизу (точна, если
+    дерево слов модели раскрыто целиком, как у небольших моделей).
+    """
+    model = compile_model(probs)
+    if draws <= 0:
+        return 0.0
+    if isinstance(model, TrieModel):
+        return model.expected_unique(draws)
+    value = model._unique.get(draws)
+    if value is None:
+        if model._frontier is None:
+            model._frontier = _word_frontier(model)
+        value = sum(-math.expm1(draws * math.log1p(-p)) if p < 1.0 else 1.0 for p in model._frontier)
+        model._unique[draws] = value
+    return value
+
+
+def generate_words_from_model(probs, count=45, rng=random):
+    """
+    Генерирует count слов. Каждый сэмпл — слово допустимой длины; повторяет попытки
+    только для дубликатов. probs — словарь из train(), уже скомпилированная модель или TrieModel.
+    rng — модуль random или свой random.Random (для воспроизводимой выдачи).
+    """
+    model = compile_model(probs)
+    rnd = rng.random
+    if isinstance(model, TrieModel):
+        sample = model.sample_word
+    else:
+        def sample(rnd):
+            return sample_word(model, rnd)
     result = []
     seen = set()
     attempts = 0
-    max_total_attempts = count * 20
+    max_total_attempts = count * ATTEMPTS_PER_WORD
     while len(result) < count and attempts < max_total_attempts:
-        w = generate_one_word(probs)
+        w = sample(rnd)
         attempts += 1
         if w and w not in seen:
             seen.add(w)
@@ -94,6 +406,355 @@ def generate_words_from_model(probs, count=45):
     return result
 
 
+# --- Модель переменного порядка: Kneser-Ney и плоский trie в файле под mmap ---
+
+_ARRAYS_HEADER = struct.Struct('<8sI')
+
+
+def _aligned(pos, to=8):
+    return pos + (-pos % to)
+
+
+def write_arrays(path, magic, header, arrays):
+    """
+    Атомарно пишет JSON-заголовок и массивы array.array в один файл:
+    MAGIC, длина заголовка, заголовок, затем секции, выровненные по 8 байт.
+    В заголовок добавляются byteorder и arrays: {имя: [смещение, typecode, длина]}.
+    """
+    header = dict(header, byteorder=sys.byteorder, arrays={})
+    # Место под заголовок — с запасом на смещения, которые станут известны ниже
+    reserve = len(json.dumps(header, ensure_ascii=False).encode('utf-8')) + 64 * len(arrays) + 64
+    pos = _aligned(_ARRAYS_HEADER.size + reserve)
+    for name, arr in arrays:
+        header['arrays'][name] = [pos, arr.typecode, len(arr)]
+        pos = _aligned(pos + arr.itemsize * len(arr))
+    raw = json.dumps(header, ensure_ascii=False, sort_keys=True).encode('utf-8')
+    if len(raw) > reserve:
+        raise ValueError('header too large')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp, 'wb') as f:
+        f.write(_ARRAYS_HEADER.pack(magic, len(raw)))
+        f.write(raw)
+        for name, arr in arrays:
+            f.write(b'\0' * (header['arrays'][name][0] - f.tell()))
+            f.write(arr.tobytes())
+    os.replace(tmp, path)
+    return header
+
+
+def map_arrays(path, magic):
+    """
+    Открывает файл write_arrays через mmap: (заголовок, {имя: memoryview}, mmap).
+    Массивы не копируются — страницы файла общие для всех процессов, которые его открыли.
+    """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    found, header_len = _ARRAYS_HEADER.unpack_from(mm, 0)
+    if found != magic:
+        raise ValueError('%s: unexpected file format' % path)
+    header = json.loads(mm[_ARRAYS_HEADER.size:_ARRAYS_HEADER.size + header_len].decode('utf-8'))
+    if header['byteorder'] != sys.byteorder:
+        raise ValueError('%s: built on a %s-endian machine' % (path, header['byteorder']))
+    view = memoryview(mm)
+    arrays = {}
+    for name, (offset, typecode, length) in header['arrays'].items():
+        size = array(typecode).itemsize
+        arrays[name] = view[offset:offset + size * length].cast(typecode)
+    return header, arrays, mm
+
+
+TRIE_MAGIC = b'TTTRIE\x00\x01'
+# Допустимый порядок модели переменного порядка (длина n-граммы)
+MIN_ORDER = 2
+MAX_ORDER = 6
+# Сколько раз TrieModel.sample_word пересэмплирует слово недопустимой длины,
+# прежде чем собрать его с ограничением длины по ходу (_draw_bounded)
+LENGTH_RETRIES = 20
+# Сэмплов для оценки expected_unique_words у TrieModel
+UNIQUE_ESTIMATE_SAMPLES = 2000
+
+
+def _kn_discount(values):
+    """Скидка Kneser-Ney по числу n-грамм, встреченных 1 и 2 раза: D = n1 / (n1 + 2 * n2)."""
+    n1 = sum(1 for v in values if v == 1)
+    n2 = sum(1 for v in values if v == 2)
+    if n1 and n2:
+        return n1 / (n1 + 2.0 * n2)
+    return 0.75
+
+
+def build_trie(counts, order):
+    """
+    Счётчики n-грамм порядка order ('c1..cn' -> вес, см. count_ngrams_file) -> интерполированная
+    модель Kneser-Ney в виде плоского trie: (заголовок, [(имя, array)]) для write_arrays.
+
+    Узел — контекст длиной 0..order-1, его родитель — тот же контекст без первого символа
+    (откат). У узла отсортированные по символу рёбра: кумулятивные alpha(c | h) = max(n - D, 0) / T
+    и id узла-контекста после символа; остаток массы gamma(h) = 1 - sum(alpha) уходит родителю.
+    Младшие порядки считаются по числу разных левых соседей (continuation counts); n-граммы,
+    начинающиеся с START, — по обычным счётчикам: слева от START бывает только START.
+    """
+    levels = {order: counts}
+    for n in range(order - 1, 0, -1):
+        lower = {}
+        for gram, cnt in levels[n + 1].items():
+            suffix = gram[1:]
+            lower[suffix] = lower.get(suffix, 0) + (cnt if suffix[0] == START else 1)
+        levels[n] = lower
+
+    contexts = {}
+    discounts = {}
+    for n, grams in levels.items():
+        discounts[n] = _kn_discount(grams.values())
+        for gram, cnt in grams.items():
+            contexts.setdefault(gram[:-1], []).append((gram[-1], cnt))
+    names = sorted(contexts, key=lambda h: (len(h), h))
+    ids = {h: i for i, h in enumerate(names)}
+    alphabet = sorted(c for c, _ in contexts[''])
+
+    first = array('I', [0])
+    parent = array('i')
+    gamma = array('d')
+    # Символы — кодовые точки; для букв из BMP хватает uint16, кумулятивным весам — float32
+    wide = any(ord(c) > 0xFFFF for c, _ in contexts[''])
+    edge_char = array('I' if wide else 'H')
+    edge_cum = array('f')
+    edge_next = array('i')
+    for h in names:
+        edges = sorted(contexts[h])
+        total = float(sum(cnt for _, cnt in edges))
+        d = discounts[len(h) + 1]
+        acc = 0.0
+        for c, cnt in edges:
+            acc += max(cnt - d, 0.0) / total
+            edge_char.append(ord(c))
+            edge_cum.append(acc)
+            if c == END:
+                edge_next.append(-1)
+                continue
+            target = (h + c)[-(order - 1):] if order > 1 else ''
+            while target not in ids:
+                target = target[1:]
+            edge_next.append(ids[target])
+        first.append(len(edge_char))
+        parent.append(ids[h[1:]] if h else -1)
+        # Остаток — от уже округлённой до float32 суммы, чтобы alpha + gamma = 1 при сэмплировании
+        gamma.append(max(1.0 - edge_cum[-1], 0.0))
+
+    header = {
+        'order': order,
+        'start': ids[START * (order - 1)],
+        'nodes': len(names),
+        'edges': len(edge_char),
+        'discounts': {str(n): d for n, d in sorted(discounts.items())},
+    }
+    arrays = [
+        ('first', first), ('parent', parent), ('gamma', gamma),
+        ('edge_char', edge_char), ('edge_cum', edge_cum), ('edge_next', edge_next),
+        ('alphabet', array('I', (ord(c) for c in alphabet))),
+    ]
+    return header, arrays
+
+
+def save_trie(counts, order, path):
+    """Строит trie по счётчикам и атомарно сохраняет; возвращает заголовок файла."""
+    header, arrays = build_trie(counts, order)
+    return write_arrays(path, TRIE_MAGIC, header, arrays)
+
+
+class TrieModel(object):
+    """
+    Модель переменного порядка из файла save_trie, открытая через mmap: ничего не распаковывается,
+    загрузка — чтение заголовка. Символ сэмплируется спуском по цепочке откатов:
+    с вероятностью sum(alpha) выбирается ребро текущего узла (bisect по кумулятивным весам),
+    иначе остаток random() переходит к родителю — ровно интерполированное распределение KN.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        header, arrays, self._mm = map_arrays(path, TRIE_MAGIC)
+        self.order = header['order']
+        self.start = header['start']
+        self.nodes = header['nodes']
+        self.edges = header['edges']
+        self.first = arrays['first']
+        self.parent = arrays['parent']
+        self.gamma = arrays['gamma']
+        self.edge_char = arrays['edge_char']
+        self.edge_cum = arrays['edge_cum']
+        self.edge_next = arrays['edge_next']
+        self.alphabet = arrays['alphabet']
+        self._end = ord(END)
+        self._unique = {}
+
+    def __len__(self):
+        return self.nodes
+
+    def _find(self, node, code):
+        """Индекс ребра code у узла или -1."""
+        lo, hi = self.first[node], self.first[node + 1]
+        i = bisect_left(self.edge_char, code, lo, hi)
+        return i if i < hi and self.edge_char[i] == code else -1
+
+    def _step(self, node, u):
+        """Один символ из P(. | node) по u в [0, 1): (код символа, следующий узел)."""
+        first, cum, gamma, parent = self.first, self.edge_cum, self.gamma, self.parent
+        n = node
+        while n >= 0:
+            lo, hi = first[n], first[n + 1]
+            mass = cum[hi - 1] if hi > lo else 0.0
+            if u < mass:
+                i = bisect_right(cum, u, lo, hi)
+                if i >= hi:
+                    i = hi - 1
+                code = self.edge_char[i]
+                if n != node:
+                    # Следующий контекст — от самого длинного узла цепочки, где этот символ есть
+                    m = node
+                    while m != n:
+                        j = self._find(m, code)
+                        if j >= 0:
+                            i = j
+                            break
+                        m = parent[m]
+                return code, self.edge_next[i]
+            g = gamma[n]
+            u = min((u - mass) / g, 0.9999999999) if g > 0.0 else 0.0
+            n = parent[n]
+        # Равномерный остаток корня: символ есть среди рёбер корня (алфавит — это они)
+        code = self.alphabet[min(int(u * len(self.alphabet)), len(self.alphabet) - 1)]
+        return code, self._next(node, code)
+
+    def _next(self, node, code):
+        """Узел после символа code: ребро самого длинного контекста цепочки откатов, где он есть."""
+        n = node
+        while True:
+            j = self._find(n, code)
+            if j >= 0:
+                return self.edge_next[j]
+            n = self.parent[n]
+
+    def _draw(self, rnd):
+        """Слово без ограничения длины (обрывается на MAX_WORD_LEN + 1 символе)."""
+        first, cum, chars, next_node = self.first, self.edge_cum, self.edge_char, self.edge_next
+        node = self.start
+        end = self._end
+        out = []
+        while len(out) <= MAX_WORD_LEN:
+            u = rnd()
+            lo, hi = first[node], first[node + 1]
+            if u < cum[hi - 1]:
+                # Частый случай — символ из рёбер самого узла, без откатов
+                i = bisect_right(cum, u, lo, hi)
+                code = chars[i if i < hi else hi - 1]
+                node = next_node[i if i < hi else hi - 1]
+            else:
+                code, node = self._step(node, u)
+            if code == end:
+                break
+            out.append(chr(code))
+        return ''.join(out)
+
+    def _draw_bounded(self, rnd):
+        """
+        Слово, длина которого ограничивается по ходу: до MIN_WORD_LEN символов конец слова
+        перевыбирается (после LENGTH_RETRIES — буква алфавита равновероятно), на MAX_WORD_LEN слово
+        обрывается. Распределение смещено относительно модели, поэтому это только запасной путь.
+        """
+        end = self._end
+        letters = [code for code in self.alphabet if code != end]
+        if not letters:
+            return None
+        node = self.start
+        out = []
+        while len(out) < MAX_WORD_LEN:
+            for _ in range(LENGTH_RETRIES):
+                code, next_node = self._step(node, rnd())
+                if code != end or len(out) >= MIN_WORD_LEN:
+                    break
+            else:
+                code = letters[min(int(rnd() * len(letters)), len(letters) - 1)]
+                next_node = self._next(node, code)
+            if code == end:
+                break
+            out.append(chr(code))
+            node = next_node
+        return ''.join(out)
+
+    def sample_word(self, rnd=random.random):
+        """
+        Слово длины MIN_WORD_LEN..MAX_WORD_LEN: отбраковкой (точное распределение модели при условии
+        длины), а если за LENGTH_RETRIES попыток не вышло — _draw_bounded. None — в модели нет букв.
+        """
+        for _ in range(LENGTH_RETRIES):
+            w = self._draw(rnd)
+            if MIN_WORD_LEN <= len(w) <= MAX_WORD_LEN:
+                return w
+        return self._draw_bounded(rnd)
+
+    def _prob(self, node, code):
+        """P(code | node) с учётом всех откатов."""
+        p = 0.0
+        scale = 1.0
+        n = node
+        while n >= 0:
+            i = self._find(n, code)
+            if i >= 0:
+                lo = self.first[n]
+                p += scale * (self.edge_cum[i] - (self.edge_cum[i - 1] if i > lo else 0.0))
+            scale *= self.gamma[n]
+            n = self.parent[n]
+        return p + scale / len(self.alphabet)
+
+    def word_prob(self, word):
+        """Вероятность слова целиком (включая конец слова) без условия на длину."""
+        node = self.start
+        p = 1.0
+        for c in word + END:
+            code = ord(c)
+            p *= self._prob(node, code)
+            if code == self._end:
+                break
+            n = node
+            while True:
+                i = self._find(n, code)
+                if i >= 0:
+                    node = self.edge_next[i]
+                    break
+                n = self.parent[n]
+                if n < 0:
+                    return 0.0
+        return p
+
+    def expected_unique(self, draws):
+        """
+        Оценка expected_unique_words по выборке: E[(1 - (1 - q)^draws) / q] по словам q-распределения,
+        где q — вероятность слова при условии допустимой длины. Результат кэшируется на draws.
+        """
+        value = self._unique.get(draws)
+        if value is not None:
+            return value
+        rnd = random.Random(0).random
+        accepted = []
+        tries = 0
+        while len(accepted) < UNIQUE_ESTIMATE_SAMPLES and tries < UNIQUE_ESTIMATE_SAMPLES * LENGTH_RETRIES:
+            w = self._draw(rnd)
+            tries += 1
+            if MIN_WORD_LEN <= len(w) <= MAX_WORD_LEN:
+                accepted.append(w)
+        if not accepted:
+            return 0.0
+        share = len(accepted) / float(tries)
+        total = 0.0
+        for w in accepted:
+            q = min(self.word_prob(w) / share, 1.0)
+            total += -math.expm1(draws * math.log1p(-q)) / q if q < 1.0 else 1.0
+        value = total / len(accepted)
+        self._unique[draws] = value
+        return value
+
+
 def get_model_path(lang='ru'):
     """Путь к файлу сохранённой модели. lang: 'ru' | 'en'. TIPTYP_DATA — каталог данных (Docker)."""
     base = os.environ.get('TIPTYP_DATA') or os.path.dirname(os.path.abspath(__file__))
@@ -104,11 +765,25 @@ def get_model_path(lang='ru'):
     return os.path.join(instance, name)
 
 
+def get_trie_path(lang='ru'):
+    """Путь к модели переменного порядка (train_word_model.py --order): рядом с .pkl, расширение .trie."""
+    return os.path.splitext(get_model_path(lang))[0] + '.trie'
+
+
+def _model_file(lang):
+    """Файл, который загружает ModelRegistry: .trie, если он есть, иначе триграммный .pkl."""
+    trie = get_trie_path(lang)
+    return trie if os.path.isfile(trie) else get_model_path(lang)
+
+
 def save_model(probs, path=None):
+    """Атомарная запись: читатели (ModelRegistry) никогда не видят наполовину записанный файл."""
     path = path or get_model_path()
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'wb') as f:
+    tmp = '%s.%d.%d.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp, 'wb') as f:
         pickle.dump(probs, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
 
 
 def load_model(path=None):
@@ -117,3 +792,108 @@ def load_model(path=None):
         return None
     with open(path, 'rb') as f:
         return pickle.load(f)
+
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ModelRegistry(object):
+    """
+    Модели в памяти процесса, по одной на язык: файл читается один раз,
+    дальше запросы получают уже скомпилированную модель.
+    Раз в check_interval секунд сверяется mtime файла; если он изменился
+    (например, после train_word_model.py), модель перечитывается. Перечитывает
+    один поток, остальные в это время продолжают получать прежнюю модель.
+    Если рядом с .pkl есть .trie (модель переменного порядка), загружается он — через mmap.
+    """
+
+    def __init__(self, check_interval=2.0):
+        self.check_interval = check_interval
+        self._entries = {}  # lang -> (path, stamp, model, checked_at)
+        self._reload_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {'loads': 0, 'hits': 0, 'reloads': 0, 'misses': 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Счётчики: loads — чтения с диска, hits — ответы из памяти, reloads — перечитывания по mtime."""
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def get(self, lang='ru'):
+        """Скомпилированная модель для lang или None, если файла модели нет."""
+        entry = self._entries.get(lang)
+        if entry is None:
+            with self._reload_lock:
+                entry = self._entries.get(lang)
+                if entry is None:
+                    return self._load(lang, _model_file(lang), reload=False)
+            self._count('hits')
+            return entry[2]
+        path, stamp, model, checked_at = entry
+        now = time.monotonic()
+        if now - checked_at >= self.check_interval and self._reload_lock.acquire(blocking=False):
+            try:
+                entry = self._entries.get(lang, entry)
+                current = _model_file(lang)
+                if current != entry[0] or entry[1] != _file_stamp(current):
+                    return self._load(lang, current, reload=True) or model
+                self._entries[lang] = (path, entry[1], entry[2], now)
+            finally:
+                self._reload_lock.release()
+        self._count('hits')
+        return model
+
+    def _load(self, lang, path, reload):
+        """Читает файл и публикует новую запись. Вызывается под _reload_lock."""
+        stamp = _file_stamp(path)
+        try:
+            if stamp is None:
+                model = None
+            elif path.endswith('.trie'):
+                model = TrieModel(path)
+            else:
+                probs = load_model(path)
+                model = compile_model(probs) if probs is not None else None
+        except Exception:
+            model = None
+        if model is None:
+            if reload:
+                # Файл пропал или битый — продолжаем отдавать прежнюю модель
+                old = self._entries[lang]
+                self._entries[lang] = (old[0], old[1], old[2], time.monotonic())
+                return None
+            self._count('misses')
+            return None
+        self._entries[lang] = (path, stamp, model, time.monotonic())
+        self._count('reloads' if reload else 'loads')
+        return model
+
+    def version(self, lang='ru'):
+        """(mtime_ns, size) файла загруженной модели или None — меняется при каждой перезагрузке."""
+        entry = self._entries.get(lang)
+        return entry[1] if entry is not None else None
+
+    def put(self, lang, probs, path=None):
+        """Регистрирует только что обученную модель (после save_model), не перечитывая файл."""
+        path = path or get_model_path(lang)
+        model = compile_model(probs)
+        with self._reload_lock:
+            self._entries[lang] = (path, _file_stamp(path), model, time.monotonic())
+        return model
+
+    def clear(self):
+        with self._reload_lock:
+            self._entries.clear()
+
+
+# Общий для процесса реестр моделей
+model_registry = ModelRegistry()